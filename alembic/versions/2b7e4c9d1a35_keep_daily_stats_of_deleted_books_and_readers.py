@@ -0,0 +1,46 @@
+"""keep daily stats of deleted books and readers
+
+Revision ID: 2b7e4c9d1a35
+Revises: 97942af7fb0a
+Create Date: 2026-10-18 21:05:12.417903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7e4c9d1a35'
+down_revision: Union[str, None] = '97942af7fb0a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Таблица статистики -> (столбец, таблица, на которую он ссылался)
+STATS_FOREIGN_KEYS = {
+    'daily_book_stats': ('book_id', 'books'),
+    'daily_reader_stats': ('reader_id', 'readers'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Итоги по дням — исторические факты: удаление книги или читателя
+    # больше не стирает их (и не меняет /stats/daily задним числом)
+    for table, (column, target) in STATS_FOREIGN_KEYS.items():
+        op.drop_constraint(f'{table}_{column}_fkey', table, type_='foreignkey')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, (column, target) in STATS_FOREIGN_KEYS.items():
+        # Строки удалённых книг и читателей не прошли бы проверку ограничения
+        op.execute(
+            f'DELETE FROM {table} WHERE NOT EXISTS '
+            f'(SELECT 1 FROM {target} WHERE {target}.id = {table}.{column})'
+        )
+        op.create_foreign_key(
+            f'{table}_{column}_fkey', table, target, [column], ['id'], ondelete='CASCADE'
+        )
@@ -0,0 +1,41 @@
+
+
+"""add partial indexes for active loans
+
+Revision ID: 34d48f1313c0
+Revises: 8ef1e16b33cf
+Create Date: 2026-10-18 19:36:50.080613
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '34d48f1313c0'
+down_revision: Union[str, None] = '8ef1e16b33cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps loans writable while the indexes are built on a large table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_loans_reader_id_active', 'loans', ['reader_id'], unique=False,
+            postgresql_where=sa.text('return_date IS NULL'), postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_loans_book_id_reader_id_active', 'loans', ['book_id', 'reader_id'], unique=False,
+            postgresql_where=sa.text('return_date IS NULL'), postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_loans_book_id_reader_id_active', table_name='loans', postgresql_concurrently=True)
+        op.drop_index('ix_loans_reader_id_active', table_name='loans', postgresql_concurrently=True)
@@ -0,0 +1,34 @@
+"""add revoked_tokens updated_at index
+
+Revision ID: 5c0f8e2a7d14
+Revises: 2b7e4c9d1a35
+Create Date: 2026-10-18 21:24:47.902215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0f8e2a7d14'
+down_revision: Union[str, None] = '2b7e4c9d1a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Инкрементальная синхронизация фильтра Блума читает только отзывы после прошлой синхронизации
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_revoked_tokens_updated_at', 'revoked_tokens', ['updated_at'], unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_revoked_tokens_updated_at', table_name='revoked_tokens', postgresql_concurrently=True)
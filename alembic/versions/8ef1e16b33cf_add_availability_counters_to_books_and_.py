@@ -0,0 +1,46 @@
+
+
+"""add availability counters to books and readers
+
+Revision ID: 8ef1e16b33cf
+Revises: 165722ea225a
+Create Date: 2026-10-18 19:35:38.360298
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8ef1e16b33cf'
+down_revision: Union[str, None] = '165722ea225a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('total_copies', sa.Integer(), nullable=True))
+    op.add_column('readers', sa.Column('active_loans', sa.Integer(), server_default='0', nullable=False))
+    # Backfill the counters from loans not returned yet
+    op.execute(
+        "UPDATE books SET total_copies = copies + ("
+        "SELECT count(*) FROM loans WHERE loans.book_id = books.id AND loans.return_date IS NULL)"
+    )
+    op.execute(
+        "UPDATE readers SET active_loans = ("
+        "SELECT count(*) FROM loans WHERE loans.reader_id = readers.id AND loans.return_date IS NULL)"
+    )
+    op.alter_column('books', 'total_copies', nullable=False)
+    op.create_check_constraint('ck_books_copies_within_total', 'books', 'copies <= total_copies')
+    op.create_check_constraint('ck_readers_active_loans_non_negative', 'readers', 'active_loans >= 0')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('ck_readers_active_loans_non_negative', 'readers', type_='check')
+    op.drop_constraint('ck_books_copies_within_total', 'books', type_='check')
+    op.drop_column('readers', 'active_loans')
+    op.drop_column('books', 'total_copies')
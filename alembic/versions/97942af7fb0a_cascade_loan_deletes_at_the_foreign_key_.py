@@ -0,0 +1,45 @@
+
+
+"""cascade loan deletes at the foreign key level
+
+Revision ID: 97942af7fb0a
+Revises: f8fdae0b54ad
+Create Date: 2026-10-18 20:12:35.629776
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '97942af7fb0a'
+down_revision: Union[str, None] = 'f8fdae0b54ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Ограничения созданы вместе с таблицей borrowed_books и сохранили её имя после переименования
+OLD_FOREIGN_KEYS = {
+    'book_id': ('borrowed_books_book_id_fkey', 'books'),
+    'reader_id': ('borrowed_books_reader_id_fkey', 'readers'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Выдачи удаляются базой вместе с книгой или читателем (ON DELETE CASCADE),
+    # без загрузки каждой выдачи в сессию ORM
+    for column, (old_name, table) in OLD_FOREIGN_KEYS.items():
+        op.drop_constraint(old_name, 'loans', type_='foreignkey')
+        op.create_foreign_key(
+            f'loans_{column}_fkey', 'loans', table, [column], ['id'], ondelete='CASCADE'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column, (old_name, table) in OLD_FOREIGN_KEYS.items():
+        op.drop_constraint(f'loans_{column}_fkey', 'loans', type_='foreignkey')
+        op.create_foreign_key(old_name, 'loans', table, [column], ['id'])
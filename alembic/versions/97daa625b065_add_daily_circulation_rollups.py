@@ -0,0 +1,47 @@
+
+
+"""add daily circulation rollups
+
+Revision ID: 97daa625b065
+Revises: e9f88759c46a
+Create Date: 2026-10-18 19:44:38.258352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '97daa625b065'
+down_revision: Union[str, None] = 'e9f88759c46a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_book_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('checkouts', sa.Integer(), nullable=False),
+    sa.Column('returns', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('day', 'book_id')
+    )
+    op.create_table('daily_reader_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('reader_id', sa.Integer(), nullable=False),
+    sa.Column('checkouts', sa.Integer(), nullable=False),
+    sa.Column('returns', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['reader_id'], ['readers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('day', 'reader_id')
+    )
+    # Заполнить из истории выдач: python -m app.cli backfill-stats
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_reader_stats')
+    op.drop_table('daily_book_stats')
@@ -0,0 +1,35 @@
+
+
+"""add loan history pagination index
+
+Revision ID: c61eb6df1431
+Revises: 34d48f1313c0
+Create Date: 2026-10-18 19:38:46.172963
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c61eb6df1431'
+down_revision: Union[str, None] = '34d48f1313c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_loans_reader_id_id', 'loans', ['reader_id', 'id'], unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_loans_reader_id_id', table_name='loans', postgresql_concurrently=True)
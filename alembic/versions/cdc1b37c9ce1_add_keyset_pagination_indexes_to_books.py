@@ -0,0 +1,32 @@
+
+
+"""add keyset pagination indexes to books
+
+Revision ID: cdc1b37c9ce1
+Revises: 4edb48a7f35d
+Create Date: 2026-10-18 19:15:57.412818
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cdc1b37c9ce1'
+down_revision: Union[str, None] = '4edb48a7f35d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_author_id', 'books', ['author', 'id'], unique=False)
+    op.create_index('ix_books_published_year_id', 'books', ['published_year', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_published_year_id', table_name='books')
+    op.drop_index('ix_books_author_id', table_name='books')
@@ -0,0 +1,42 @@
+
+
+"""add full-text search index to books
+
+Revision ID: ce313516d517
+Revises: cdc1b37c9ce1
+Create Date: 2026-10-18 19:17:37.092190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ce313516d517'
+down_revision: Union[str, None] = 'cdc1b37c9ce1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Weighted document: title > author > description; 'simple' config avoids language-specific stemming
+    op.execute(
+        "ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+        ") STORED"
+    )
+    op.create_index(
+        'ix_books_search_vector', 'books', ['search_vector'],
+        unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.drop_column('books', 'search_vector')
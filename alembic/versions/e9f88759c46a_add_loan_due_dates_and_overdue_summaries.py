@@ -0,0 +1,59 @@
+
+
+"""add loan due dates and overdue summaries
+
+Revision ID: e9f88759c46a
+Revises: c61eb6df1431
+Create Date: 2026-10-18 19:41:56.227752
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9f88759c46a'
+down_revision: Union[str, None] = 'c61eb6df1431'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('loans', sa.Column('due_date', sa.DateTime(timezone=True), nullable=True))
+    # Existing loans get the default 14-day loan period (LOAN_PERIOD_DAYS)
+    op.execute("UPDATE loans SET due_date = loan_date + interval '14 days'")
+    op.alter_column('loans', 'due_date', nullable=False)
+    # CONCURRENTLY keeps loans writable while the index is built; this commits the column change first
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_loans_due_date_active', 'loans', ['due_date', 'id'], unique=False,
+            postgresql_where=sa.text('return_date IS NULL'), postgresql_concurrently=True
+        )
+    op.create_table('job_states',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('overdue_summaries',
+    sa.Column('reader_id', sa.Integer(), nullable=False),
+    sa.Column('overdue_loans', sa.Integer(), nullable=False),
+    sa.Column('oldest_due_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['reader_id'], ['readers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('reader_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('overdue_summaries')
+    op.drop_table('job_states')
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_loans_due_date_active', table_name='loans', postgresql_concurrently=True)
+    op.drop_column('loans', 'due_date')
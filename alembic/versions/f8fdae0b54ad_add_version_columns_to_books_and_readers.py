@@ -0,0 +1,33 @@
+
+
+"""add version columns to books and readers
+
+Revision ID: f8fdae0b54ad
+Revises: 97daa625b065
+Create Date: 2026-10-18 20:06:44.160238
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8fdae0b54ad'
+down_revision: Union[str, None] = '97daa625b065'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Существующие записи начинают с версии 1
+    op.add_column('books', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('readers', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('readers', 'version')
+    op.drop_column('books', 'version')
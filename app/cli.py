@@ -0,0 +1,111 @@
+"""
+Maintenance commands, meant to be run from cron or by hand:
+
+    python -m app.cli purge-revoked-tokens
+    python -m app.cli reconcile-counters
+    python -m app.cli scan-overdue
+    python -m app.cli backfill-stats
+    python -m app.cli deactivate-user someone@example.com
+    python -m app.cli activate-user someone@example.com
+"""
+import argparse
+import asyncio
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.core.revocation import revocation_list
+from app.services.auth_service import AuthService
+from app.services.loan_service import LoanService
+from app.services.overdue_service import OverdueService
+from app.services.stats_service import StatsService
+
+
+async def _purge_revoked_tokens() -> int:
+    async with AsyncSessionLocal() as db:
+        return await revocation_list.store.purge_expired(db)
+
+
+def purge_revoked_tokens() -> None:
+    """Delete revocation records of tokens that have already expired."""
+    removed = asyncio.run(_purge_revoked_tokens())
+    print(f"Purged {removed} expired revoked tokens")
+
+
+async def _reconcile_counters():
+    async with AsyncSessionLocal() as db:
+        return await LoanService.reconcile_counters(db)
+
+
+def reconcile_counters() -> None:
+    """Recompute book availability and reader loan counters from the loans table."""
+    books, readers = asyncio.run(_reconcile_counters())
+    print(f"Corrected counters of {books} books and {readers} readers")
+    if books and settings.BOOK_CACHE_BACKEND == "memory":
+        print(f"API workers keep cached copies of these books for up to {settings.BOOK_CACHE_TTL_SECONDS}s")
+
+
+def scan_overdue() -> None:
+    """Run the overdue scan once, e.g. when the in-app scheduler is disabled."""
+    readers = asyncio.run(OverdueService.run_scan())
+    if readers is None:
+        print("Overdue scan is already running")
+    else:
+        print(f"Updated overdue summaries of {readers} readers")
+
+
+async def _backfill_stats():
+    async with AsyncSessionLocal() as db:
+        return await StatsService.backfill(db)
+
+
+def backfill_stats() -> None:
+    """Rebuild the daily circulation rollups from the whole loan history."""
+    books, readers = asyncio.run(_backfill_stats())
+    print(f"Wrote {books} daily book rows and {readers} daily reader rows")
+
+
+async def _set_user_active(email: str, is_active: bool):
+    async with AsyncSessionLocal() as db:
+        return await AuthService.set_user_active(db, email, is_active)
+
+
+def deactivate_user(email: str) -> None:
+    """Deactivate a user; their tokens stop working in every worker."""
+    user = asyncio.run(_set_user_active(email, False))
+    print(f"Deactivated {email}" if user else f"No user {email}")
+
+
+def activate_user(email: str) -> None:
+    """Reactivate a deactivated user."""
+    user = asyncio.run(_set_user_active(email, True))
+    print(f"Activated {email}" if user else f"No user {email}")
+
+
+COMMANDS = {
+    "purge-revoked-tokens": purge_revoked_tokens,
+    "reconcile-counters": reconcile_counters,
+    "scan-overdue": scan_overdue,
+    "backfill-stats": backfill_stats,
+}
+# Commands that act on one user, given by email
+USER_COMMANDS = {
+    "deactivate-user": deactivate_user,
+    "activate-user": activate_user,
+}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Library API maintenance")
+    parser.add_argument("command", choices=sorted({**COMMANDS, **USER_COMMANDS}))
+    parser.add_argument("email", nargs="?", help="user of deactivate-user / activate-user")
+    args = parser.parse_args(argv)
+    if args.command in USER_COMMANDS:
+        if not args.email:
+            parser.error(f"{args.command} needs the user's email")
+        USER_COMMANDS[args.command](args.email)
+    else:
+        COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
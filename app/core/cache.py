@@ -0,0 +1,197 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from app.core.config import settings
+
+
+class LRUCache:
+    """
+    In-process LRU cache bounded by entry count, with TTL expiry. Thread-safe.
+
+    Being local, it can hold arbitrary Python objects and is used synchronously.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store the value unless the key holds an unexpired entry; return whether it was stored."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                return False
+            self._data[key] = (now + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any], bool]) -> None:
+        """Drop every entry whose value satisfies the predicate."""
+        with self._lock:
+            for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "max_size": self.max_size}
+
+
+class CacheBackend(ABC):
+    """
+    Async interface of a byte-value cache with per-entry expiry and hit/miss counters.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Store the value only if the key is empty; return whether it was stored."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class MemoryCache(CacheBackend):
+    """
+    CacheBackend kept in an LRUCache of this process.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.lru = LRUCache(max_size=max_size, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.lru.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.lru.set(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return self.lru.add(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self.lru.delete(key)
+
+    async def clear(self) -> None:
+        self.lru.clear()
+
+    def stats(self) -> dict:
+        return self.lru.stats()
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache stored in any server speaking the Redis protocol (Redis, Valkey, KeyDB...).
+
+    `client` is a redis.asyncio compatible client; keys are prefixed with
+    `namespace` so several caches can share one database.
+    """
+
+    def __init__(self, client, ttl: float, namespace: str):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = f"{namespace}:"
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self.client.set(self.prefix + key, value, px=int((self.ttl if ttl is None else ttl) * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        px = int((self.ttl if ttl is None else ttl) * 1000)
+        return bool(await self.client.set(self.prefix + key, value, px=px, nx=True))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_cache(backend: str, namespace: str, max_size: int, ttl: float) -> CacheBackend:
+    """
+    Build the cache backend named in settings: "memory" or "redis".
+    """
+    if backend == "memory":
+        return MemoryCache(max_size=max_size, ttl=ttl)
+    if backend == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("The redis cache backend requires the 'redis' package") from exc
+        if not settings.REDIS_URL:
+            raise RuntimeError("REDIS_URL must be set to use the redis cache backend")
+        return RedisCache(redis.Redis.from_url(settings.REDIS_URL), ttl=ttl, namespace=namespace)
+    raise ValueError(f"Unknown cache backend: {backend!r}")
+
+
+book_cache = create_cache(
+    settings.BOOK_CACHE_BACKEND,
+    namespace="book",
+    max_size=settings.BOOK_CACHE_MAX_SIZE,
+    ttl=settings.BOOK_CACHE_TTL_SECONDS,
+)
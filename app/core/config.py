@@ -1,14 +1,52 @@
-from pydantic import BaseSettings
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None
+    ENVIRONMENT: str = "development"
+    # Connection pool; None means the default for ENVIRONMENT (see app/db.py)
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: Optional[float] = None
+    DB_POOL_RECYCLE: Optional[int] = None
+    DB_POOL_PRE_PING: Optional[bool] = None
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 500
+    # Pages rendered by app.utils.render_page are cut short beyond this size
+    MAX_PAGE_BYTES: int = 262144
+    # List endpoints encode selected rows with orjson, skipping response model validation
+    FAST_LIST_SERIALIZATION: bool = False
+    REDIS_URL: Optional[str] = None
+    BOOK_CACHE_BACKEND: str = "memory"
+    BOOK_CACHE_TTL_SECONDS: int = 300
+    BOOK_CACHE_MAX_SIZE: int = 10000
+    # Cache-Control of the public catalog reads (GET /books/, GET /books/{id});
+    # e.g. "public, max-age=0, s-maxage=5" lets a reverse proxy answer polls. Empty: no header
+    CATALOG_CACHE_CONTROL: str = "public, no-cache"
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    TOKEN_REVOCATION_BACKEND: str = "database"
+    REVOCATION_SYNC_SECONDS: float = 5.0
+    REVOCATION_FULL_SYNC_SECONDS: float = 600.0
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+    LOAN_PERIOD_DAYS: int = 14
+    # How often each worker runs the overdue scan; 0 disables it
+    OVERDUE_SCAN_INTERVAL_SECONDS: float = 300
+    # Requests running more queries than this are logged (N+1 detection); 0 disables
+    REQUEST_QUERY_WARN_THRESHOLD: int = 20
 
-    class Config:
-        env_file = ".env"
+    # Like pydantic v1 settings, keys in .env this class doesn't declare are ignored
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
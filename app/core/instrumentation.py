@@ -0,0 +1,139 @@
+"""
+Per-request instrumentation: latency, in-flight requests, response sizes and
+the number and duration of database queries, exported through app.core.metrics.
+
+Queries are counted by cursor-execute listeners that `instrument_engine`
+attaches to an engine; they add to the RequestStats of the request being
+served, found through a context variable.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUESTS = metrics.counter(
+    "http_requests_total", "Requests served", ["method", "route", "status"]
+)
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Request latency, until the last body chunk is sent", ["method", "route"]
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "Requests being served"
+)
+REQUESTS_IN_FLIGHT.set(0)
+RESPONSE_BYTES = metrics.histogram(
+    "http_response_size_bytes", "Response body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+REQUEST_QUERIES = metrics.histogram(
+    "http_request_db_queries", "Database queries run by a request", ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = metrics.histogram(
+    "http_request_db_seconds", "Time a request spent executing database queries", ["method", "route"]
+)
+QUERY_SECONDS = metrics.histogram(
+    "db_query_duration_seconds", "Database query latency", ["engine"]
+)
+
+
+class RequestStats:
+    """Database work done on behalf of one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """RequestStats of the request being served, or None outside of one."""
+    return _current.get()
+
+
+# The start time lives on the statement's execution context, so a statement
+# that fails (and never reaches after_cursor_execute) leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    QUERY_SECONDS.observe(elapsed, engine=conn.engine.url.get_backend_name())
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time the queries of a sync Engine (for an AsyncEngine, pass its sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording the metrics above for every HTTP request, and
+    logging requests that ran more than REQUEST_QUERY_WARN_THRESHOLD queries.
+    Routes are labelled by their path template, e.g. /books/{book_id}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            _current.reset(token)
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUESTS.inc(method=method, route=route, status=str(status_code))
+            REQUEST_SECONDS.observe(elapsed, method=method, route=route)
+            RESPONSE_BYTES.observe(size, method=method, route=route)
+            REQUEST_QUERIES.observe(stats.queries, method=method, route=route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method=method, route=route)
+            threshold = settings.REQUEST_QUERY_WARN_THRESHOLD
+            if threshold and stats.queries > threshold:
+                logger.warning(
+                    "%s %s ran %d queries (%.1f ms in the database, %.1f ms total)",
+                    method, route, stats.queries, stats.db_seconds * 1000, elapsed * 1000,
+                )
@@ -0,0 +1,255 @@
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db import commit
+from app.models.revoked_token import RevokedToken
+
+# Incremental syncs also re-read revocations this much older than the previous
+# sync, for rows committed after it started and for clock skew between hosts
+SYNC_OVERLAP_SECONDS = 60
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings: no false negatives, tunable false positive rate.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationStore(ABC):
+    """
+    Shared, authoritative storage of revoked token ids (JWT `jti`).
+    """
+
+    @abstractmethod
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: datetime) -> None:
+        ...
+
+    @abstractmethod
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def active_jtis(self, db: AsyncSession, since: Optional[datetime] = None) -> Iterable[str]:
+        """
+        Ids of revoked tokens that have not expired yet; with `since`, only
+        those revoked (or revoked again) after it.
+        """
+
+    @abstractmethod
+    async def purge_expired(self, db: AsyncSession) -> int:
+        """Delete entries of expired tokens, return how many were removed."""
+
+
+class DatabaseRevocationStore(RevocationStore):
+    """
+    Revocations kept in the revoked_tokens table.
+    """
+
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: datetime) -> None:
+        if await db.get(RevokedToken, jti) is None:
+            db.add(RevokedToken(jti=jti, expires_at=expires_at))
+        else:
+            # Revoked again (e.g. a user marker): keep the later expiry
+            await db.execute(
+                update(RevokedToken)
+                .where(RevokedToken.jti == jti, RevokedToken.expires_at < expires_at)
+                .values(expires_at=expires_at)
+            )
+        await commit(db)
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        return await db.get(RevokedToken, jti) is not None
+
+    async def active_jtis(self, db: AsyncSession, since: Optional[datetime] = None) -> Iterable[str]:
+        stmt = select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.now(timezone.utc))
+        if since is not None:
+            # updated_at also moves when a jti is revoked again, see revoke
+            stmt = stmt.where(RevokedToken.updated_at > since)
+        return (await db.scalars(stmt)).all()
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= now)
+        )
+        await commit(db)
+        return result.rowcount
+
+
+class RedisRevocationStore(RevocationStore):
+    """
+    Revocations kept in a Redis-protocol server as keys that expire together with the token.
+
+    A sorted set of jtis scored by revocation time, trimmed to the last
+    `log_seconds`, serves incremental syncs without a SCAN of all keys.
+    """
+
+    def __init__(self, client, log_seconds: float, namespace: str = "revoked"):
+        self.client = client
+        self.log_seconds = log_seconds
+        self.prefix = f"{namespace}:"
+        # Outside the prefix, so SCANs of the revocation keys don't return it
+        self.log_key = f"{namespace}-log"
+
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: datetime) -> None:
+        now = time.time()
+        ttl = max(1, math.ceil(expires_at.timestamp() - now))
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + jti, b"1", ex=ttl)
+            pipe.zadd(self.log_key, {jti: now})
+            pipe.zremrangebyscore(self.log_key, "-inf", now - self.log_seconds)
+            await pipe.execute()
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        return bool(await self.client.exists(self.prefix + jti))
+
+    async def active_jtis(self, db: AsyncSession, since: Optional[datetime] = None) -> Iterable[str]:
+        if since is not None:
+            # May include expired jtis; they only cost a confirmation lookup
+            return [jti.decode() for jti in await self.client.zrangebyscore(self.log_key, since.timestamp(), "+inf")]
+        start = len(self.prefix)
+        return [key.decode()[start:] async for key in self.client.scan_iter(match=self.prefix + "*")]
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        # Redis expires keys on its own
+        return 0
+
+
+class RevocationList:
+    """
+    Worker-local view of the revocation store.
+
+    Every token is first checked against a Bloom filter of all active
+    revocations, so the common case (token not revoked) needs no I/O. Only
+    filter hits are confirmed in the store. Every `sync_interval` seconds the
+    revocations made since the previous sync are added to the filter, which
+    is how revocations made by other workers become visible here. Every
+    `full_sync_interval` seconds, or once the filter holds more entries than
+    it was sized for, it is rebuilt from all active revocations instead,
+    which drops the expired ones.
+    """
+
+    def __init__(
+        self,
+        store: RevocationStore,
+        sync_interval: float,
+        full_sync_interval: float,
+        capacity: int,
+        error_rate: float,
+    ):
+        self.store = store
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget local state; the next check rebuilds the filter from the store."""
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        self._entries = 0
+        self._next_sync = 0.0
+        self._next_full_sync = 0.0
+        # Wall-clock start of the last sync, the lower bound of the next incremental one
+        self._synced_at: Optional[datetime] = None
+        # Local revocations that a rebuild in progress may not have seen
+        self._revoked_during_sync: Set[str] = set()
+
+    def _add(self, jti: str) -> None:
+        if jti not in self._bloom:
+            self._bloom.add(jti)
+            self._entries += 1
+
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: datetime) -> None:
+        await self.store.revoke(db, jti, expires_at)
+        self._add(jti)
+        self._revoked_during_sync.add(jti)
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        if time.monotonic() >= self._next_sync:
+            await self.sync(db)
+        if jti not in self._bloom:
+            return False
+        return await self.store.is_revoked(db, jti)
+
+    async def sync(self, db: AsyncSession) -> None:
+        """
+        Add the revocations made since the last sync to the Bloom filter, or
+        rebuild it from all active revocations when a full sync is due.
+        """
+        now = time.monotonic()
+        started = datetime.now(timezone.utc)
+        # Push the deadline first so concurrent requests don't all start a sync
+        self._next_sync = now + self.sync_interval
+        if self._synced_at is not None and now < self._next_full_sync and self._entries <= self._bloom.capacity:
+            since = self._synced_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+            self._synced_at = started
+            for jti in await self.store.active_jtis(db, since=since):
+                self._add(jti)
+            return
+        self._next_full_sync = now + self.full_sync_interval
+        self._synced_at = started
+        self._revoked_during_sync = set()
+        jtis = list(await self.store.active_jtis(db))
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis + list(self._revoked_during_sync):
+            bloom.add(jti)
+        self._bloom, self._entries = bloom, len(jtis)
+
+
+def create_revocation_store(backend: str) -> RevocationStore:
+    """
+    Build the revocation store named in settings: "database" or "redis".
+    """
+    if backend == "database":
+        return DatabaseRevocationStore()
+    if backend == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("The redis revocation backend requires the 'redis' package") from exc
+        if not settings.REDIS_URL:
+            raise RuntimeError("REDIS_URL must be set to use the redis revocation backend")
+        # The log must reach back to the oldest incremental sync: a full sync interval and the overlap
+        return RedisRevocationStore(
+            redis.Redis.from_url(settings.REDIS_URL),
+            log_seconds=settings.REVOCATION_FULL_SYNC_SECONDS + SYNC_OVERLAP_SECONDS,
+        )
+    raise ValueError(f"Unknown revocation backend: {backend!r}")
+
+
+revocation_list = RevocationList(
+    create_revocation_store(settings.TOKEN_REVOCATION_BACKEND),
+    sync_interval=settings.REVOCATION_SYNC_SECONDS,
+    full_sync_interval=settings.REVOCATION_FULL_SYNC_SECONDS,
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.REVOCATION_BLOOM_ERROR_RATE,
+)
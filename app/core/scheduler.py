@@ -0,0 +1,41 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Runs a coroutine function every `interval` seconds on this worker's event loop,
+    from application startup to shutdown. A failing run is logged and retried
+    at the next interval.
+    """
+
+    def __init__(self, name: str, job: Callable[[], Awaitable[object]]):
+        self.name = name
+        self.job = job
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, interval: float) -> None:
+        """Start running the job; an interval of 0 or less leaves it disabled."""
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(interval), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            try:
+                await self.job()
+            except Exception:
+                logger.exception("Periodic task %s failed", self.name)
+            await asyncio.sleep(interval)
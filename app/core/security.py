@@ -1,25 +1,55 @@
-from datetime import datetime, timedelta
-from typing import Optional, Set
+import asyncio
+import hashlib
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException,Security, status
 from fastapi.security.api_key import APIKeyHeader
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.revocation import revocation_list
 from app.db import get_db
 from app.models.user import User
 
 # --- Constants and dependencies ---
 api_key_scheme = APIKeyHeader(name="Authorization", auto_error=False)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
     detail="Could not validate credentials",
     headers={"WWW-Authenticate": "Bearer"},
 )
-revoked_tokens: Set[str] = set()
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated user as seen by request handlers."""
+    id: int
+    email: str
+    is_active: bool
+
+
+# Verified token -> (jti, Principal), so hot tokens skip both JWT decoding and the users query.
+# Changes made through invalidate_user_principals reach every worker within
+# REVOCATION_SYNC_SECONDS; changes to users made outside the app (plain SQL)
+# are seen once the entries expire, after at most PRINCIPAL_CACHE_TTL_SECONDS.
+principal_cache = LRUCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
 
 def get_token(api_key: str = Security(api_key_scheme)):
     if not api_key:
@@ -31,21 +61,88 @@ def get_token(api_key: str = Security(api_key_scheme)):
         return api_key[len("Bearer "):]
     return api_key
 
-def get_password_hash(password: str) -> str:
-    """Return bcrypt hash of the given password."""
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool so hashing never competes with
+    request handling for the worker's CPU and GIL.
+
+    At most `queue_limit` operations may be queued or running; beyond that
+    callers get 503 with Retry-After instead of piling up. With
+    `workers=0` hashing runs inline (still bounded by the limit).
+    """
+
+    def __init__(self, workers: int, queue_limit: int, retry_after: int):
+        self.workers = workers
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, retry later",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        try:
+            if self.workers == 0:
+                return fn(*args)
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
+
+
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def get_password_hash(password: str) -> str:
+    """Return bcrypt hash of the given password."""
+    return await password_hasher.run(_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plaintext password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return (await verify_and_update_password(plain_password, hashed_password))[0]
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if its hash uses outdated settings (e.g. lower bcrypt cost),
+    also return a fresh hash to store. The second item is None when no update is needed.
+    """
+    return await password_hasher.run(_verify_and_update, plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Generate a JWT with subject and expiry."""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
 
 
@@ -58,23 +155,79 @@ def decode_access_token(token: str) -> dict:
         raise credentials_exception
 
 
-def get_current_user(
+def get_token_id(token: str, payload: dict) -> str:
+    """Return the token's jti; tokens issued without one are identified by their hash."""
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+
+async def get_current_user(
     token: str = Depends(get_token),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> Principal:
     """Return current authenticated user or raise credentials exception."""
-    if token in revoked_tokens:
-        raise credentials_exception
+    cached = principal_cache.get(token)
+    if cached is not None:
+        jti, principal = cached
+        if await revocation_list.is_revoked(db, jti):
+            principal_cache.delete(token)
+            raise credentials_exception
+        if not await revocation_list.is_revoked(db, user_marker(principal.id)):
+            return principal
+        # The user was changed since the principal was cached: look them up again
+        principal_cache.delete(token)
     payload = decode_access_token(token)
+    jti = get_token_id(token, payload)
+    if await revocation_list.is_revoked(db, jti):
+        raise credentials_exception
     email: str = payload.get("sub")
     if email is None:
         raise credentials_exception
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is None or not user.is_active:
         raise credentials_exception
-    return user
+    principal = Principal(id=user.id, email=user.email, is_active=user.is_active)
+    # Never keep a token cached past its own expiry
+    ttl = min(principal_cache.ttl, payload.get("exp", math.inf) - time.time())
+    principal_cache.set(token, (jti, principal), ttl=ttl)
+    return principal
+
+
+async def revoke_token(token: str, db: AsyncSession) -> None:
+    """Record the token in the shared revocation store."""
+    payload = decode_access_token(token)
+    if "exp" in payload:
+        expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+    else:
+        # A token without expiry stays valid, so must its revocation
+        expires_at = datetime.max.replace(tzinfo=timezone.utc)
+    await revocation_list.revoke(db, get_token_id(token, payload), expires_at)
+    principal_cache.delete(token)
+
+
+def user_marker(user_id: int) -> str:
+    """Revocation store key telling every worker that a user's cached principals are stale."""
+    return f"user:{user_id}"
+
+
+def forget_user_principals(user_id: int) -> None:
+    """Forget the cached principals of a user in this worker."""
+    principal_cache.delete_where(lambda entry: entry[1].id == user_id)
+
+
+async def invalidate_user_principals(db: AsyncSession, user_id: int) -> None:
+    """
+    Make every worker look the user up again instead of using cached
+    principals, e.g. after deactivating them. The marker is kept in the shared
+    revocation store for as long as a principal can stay cached.
+    """
+    forget_user_principals(user_id)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=principal_cache.ttl)
+    await revocation_list.revoke(db, user_marker(user_id), expires_at)
 
 
-def revoke_token(token: str) -> None:
-    """Add token to in-memory blacklist."""
-    revoked_tokens.add(token)
+@event.listens_for(User, "after_update")
+def _invalidate_on_deactivation(mapper, connection, target: User) -> None:
+    # Covers ORM changes in this worker; other workers learn of them through
+    # invalidate_user_principals
+    if inspect(target).attrs.is_active.history.has_changes():
+        forget_user_principals(target.id)
@@ -1,24 +1,199 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session, declarative_base
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core import metrics
+from app.core.instrumentation import instrument_engine
+
+# Драйверы для асинхронного движка, соответствующие синхронным из DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+# Параметры пула по окружениям. Рассчитаны на контейнеры с cpus: 0.5:
+# размер пула одного воркера * число воркеров должен оставаться ниже max_connections Postgres.
+POOL_DEFAULTS = {
+    "development": {"pool_size": 5, "max_overflow": 5, "pool_timeout": 30, "pool_recycle": 1800, "pool_pre_ping": True},
+    "production": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 10, "pool_recycle": 1800, "pool_pre_ping": False},
+    "test": {"pool_size": 2, "max_overflow": 0, "pool_timeout": 5, "pool_recycle": -1, "pool_pre_ping": False},
+}
 
-# Инициализация подключения и сессии к базе данных
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True
+POOL_CHECKOUT_SECONDS = metrics.histogram(
+    "db_pool_checkout_seconds", "Time to obtain a connection from the pool", ["engine"]
 )
-SessionLocal = sessionmaker(
-    autocommit=False,
+POOL_WAITS = metrics.counter(
+    "db_pool_waits_total", "Checkouts that found the pool and its overflow exhausted", ["engine"]
+)
+POOL_TIMEOUTS = metrics.counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after pool_timeout", ["engine"]
+)
+
+
+def to_async_url(url: str) -> str:
+    """Return the async-driver equivalent of a sync database URL."""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Records checkout latency, waits and timeouts of the async engine's pool."""
+    metrics_label = "async"
+
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.metrics_max_overflow = max_overflow
+
+    def _do_get(self):
+        if self.checkedin() == 0 and self.overflow() >= self.metrics_max_overflow:
+            POOL_WAITS.inc(engine=self.metrics_label)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc(engine=self.metrics_label)
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start, engine=self.metrics_label)
+
+
+def pool_options(url: str, poolclass) -> dict:
+    """Engine pool arguments: ENVIRONMENT defaults overridden by DB_POOL_* settings."""
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite uses its own single-connection pools
+        return {}
+    options = dict(POOL_DEFAULTS.get(settings.ENVIRONMENT, POOL_DEFAULTS["production"]))
+    overrides = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    options["poolclass"] = poolclass
+    return options
+
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+
+# Асинхронный движок и сессии: запросы API, CLI-команды и планировщик
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **pool_options(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool)
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
     autoflush=False,
-    bind=engine
+    expire_on_commit=False
 )
 
-def get_db() -> Session:
-    """Dependency для получения сессии базы данных"""
-    db = SessionLocal()
-    try:
+instrument_engine(async_engine.sync_engine)
+
+
+def _sqlite_foreign_keys_on(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def enforce_foreign_keys(engine: Engine) -> None:
+    """
+    Make SQLite check foreign keys and run their ON DELETE actions, which it
+    only does when enabled on each connection (PostgreSQL always does).
+    For an AsyncEngine, pass its sync_engine.
+    """
+    if engine.dialect.name == "sqlite" and not event.contains(engine, "connect", _sqlite_foreign_keys_on):
+        event.listen(engine, "connect", _sqlite_foreign_keys_on)
+
+
+enforce_foreign_keys(async_engine.sync_engine)
+
+
+def _pool_state():
+    pool = async_engine.sync_engine.pool
+    if isinstance(pool, QueuePool):
+        yield "async", pool
+
+
+metrics.gauge(
+    "db_pool_size", "Configured pool size", ["engine"],
+    callback=lambda: [((label,), pool.size()) for label, pool in _pool_state()]
+)
+metrics.gauge(
+    "db_pool_checked_out", "Connections currently checked out", ["engine"],
+    callback=lambda: [((label,), pool.checkedout()) for label, pool in _pool_state()]
+)
+metrics.gauge(
+    "db_pool_overflow", "Overflow connections currently open", ["engine"],
+    callback=lambda: [((label,), max(pool.overflow(), 0)) for label, pool in _pool_state()]
+)
+
+
+# Ключ в session.info: сессия принадлежит единице работы запроса
+UNIT_OF_WORK = "unit_of_work"
+
+
+@asynccontextmanager
+async def unit_of_work(session_factory=AsyncSessionLocal) -> AsyncIterator[AsyncSession]:
+    """
+    Session whose writes are committed once, when the block exits without an
+    error; on an error the session is closed and the transaction rolled back.
+    Services end their writes with `commit`, which defers to the unit of work.
+    """
+    async with session_factory() as db:
+        db.info[UNIT_OF_WORK] = True
+        yield db
+        await _commit(db)
+
+
+async def _commit(db: AsyncSession) -> None:
+    await db.commit()
+    for callback in db.info.pop("after_commit", []):
+        await callback()
+
+
+async def commit(db: AsyncSession) -> None:
+    """
+    Finish a service's writes: inside a unit of work only flush them (the
+    request commits once, at its end), otherwise (CLI, scheduler) commit now.
+    """
+    if db.info.get(UNIT_OF_WORK):
+        await db.flush()
+    else:
+        await _commit(db)
+
+
+async def checkpoint(db: AsyncSession) -> None:
+    """
+    Commit now, even inside a unit of work: for long writes that commit in
+    steps (the book import), so a later failure leaves earlier steps stored.
+    """
+    await _commit(db)
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """Run `callback` once the session's current writes are committed by `commit`."""
+    db.info.setdefault("after_commit", []).append(callback)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency для получения асинхронной сессии базы данных: единица работы
+    запроса. Объявляется как Depends(get_db, scope="function"), чтобы коммит
+    выполнялся до отправки ответа, а его ошибки доходили до обработчиков исключений.
+    """
+    async with unit_of_work() as db:
         yield db
-    finally:
-        db.close()
 
 Base = declarative_base()
@@ -1,22 +1,41 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.security.api_key import APIKeyHeader
 from sqlalchemy.exc import IntegrityError
 
+from app.core.config import settings
+from app.core.instrumentation import RequestMetricsMiddleware
+from app.core.security import password_hasher
+from app.services.overdue_service import overdue_scan
 from app.routers.auth import router as auth_router 
 from app.routers.books import router as books_router
 from app.routers.readers import router as readers_router
 from app.routers.loan import router as loan_router
+from app.routers.export import router as export_router
+from app.routers.metrics import router as metrics_router
+from app.routers.stats import router as stats_router
 
 
 
 api_key_scheme = APIKeyHeader(name="Authorization", auto_error=False)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    overdue_scan.start(settings.OVERDUE_SCAN_INTERVAL_SECONDS)
+    yield
+    await overdue_scan.stop()
+    password_hasher.shutdown()
+
+
 app = FastAPI(
     title="Library API",
     description="RESTful API for managing a library catalog",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.exception_handler(IntegrityError)
@@ -37,4 +56,7 @@ async def integrity_error_handler(request: Request, exc: IntegrityError):
 app.include_router(auth_router)
 app.include_router(books_router)
 app.include_router(readers_router)
-app.include_router(loan_router)  
+app.include_router(loan_router)
+app.include_router(export_router)
+app.include_router(metrics_router)
+app.include_router(stats_router)
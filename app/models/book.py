@@ -1,16 +1,25 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, UniqueConstraint, CheckConstraint
+    Column, Integer, String, Text, UniqueConstraint, CheckConstraint, Index, DDL, event
 )
 from sqlalchemy.orm import relationship
 from app.db import Base
 from .mixins import TimestampMixin
 
 
+def _default_total_copies(context) -> int:
+    # A new book starts with all of its copies available
+    return context.get_current_parameters().get('copies', 1)
+
+
 class Book(Base, TimestampMixin):
     __tablename__ = 'books'
     __table_args__ = (
         UniqueConstraint('isbn', name='uq_books_isbn'),
         CheckConstraint('copies >= 0', name='ck_books_copies_non_negative'),
+        CheckConstraint('copies <= total_copies', name='ck_books_copies_within_total'),
+        # Keyset pagination walks books by id inside a filter
+        Index('ix_books_author_id', 'author', 'id'),
+        Index('ix_books_published_year_id', 'published_year', 'id'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -18,13 +27,59 @@ class Book(Base, TimestampMixin):
     author = Column(String(255), nullable=False)
     published_year = Column(Integer, CheckConstraint('published_year >= 0'), nullable=True)
     isbn = Column(String(20), nullable=True, index=True)
+    # copies: available now; total_copies: held by the library.
+    # total_copies - copies always equals the book's active loans.
     copies = Column(Integer, default=1, nullable=False)
+    total_copies = Column(Integer, default=_default_total_copies, nullable=False)
     description = Column(Text, nullable=True)
+    # Bumped by every edit of the book; PUT/PATCH with If-Match compare it
+    version = Column(Integer, default=1, server_default='1', nullable=False)
 
+    # Loans are removed by ON DELETE CASCADE, without loading them
     loans = relationship(
-        'Loan', back_populates='book', cascade='all, delete-orphan'
+        'Loan', back_populates='book', cascade='all, delete-orphan', passive_deletes=True
     )
 
 
     def __repr__(self):
         return f"<Book(id={self.id}, title={self.title!r})>"
+
+
+
+# Full-text index over title/author/description.
+# PostgreSQL: generated tsvector column + GIN index (also created by Alembic migration).
+# SQLite: external-content FTS5 table kept in sync by triggers.
+SEARCH_TS_CONFIG = 'simple'
+
+_search_ddl = {
+    'postgresql': [
+        "ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(author, '')), 'B') || "
+        f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(description, '')), 'C')"
+        ") STORED",
+        "CREATE INDEX ix_books_search_vector ON books USING gin (search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE books_fts USING fts5("
+        "title, author, description, content='books', content_rowid='id')",
+        "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+        "INSERT INTO books_fts(rowid, title, author, description) "
+        "VALUES (new.id, new.title, new.author, new.description); END",
+        "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description); END",
+        "CREATE TRIGGER books_fts_au AFTER UPDATE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description); "
+        "INSERT INTO books_fts(rowid, title, author, description) "
+        "VALUES (new.id, new.title, new.author, new.description); END",
+    ],
+}
+for _dialect, _statements in _search_ddl.items():
+    for _statement in _statements:
+        event.listen(Book.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+event.listen(
+    Book.__table__, 'before_drop',
+    DDL("DROP TABLE IF EXISTS books_fts").execute_if(dialect='sqlite')
+)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime
+from app.db import Base
+from .mixins import TimestampMixin
+
+
+class JobState(Base, TimestampMixin):
+    """
+    Progress of a background job, so each run only processes what changed since the last one.
+    """
+    __tablename__ = 'job_states'
+
+    name = Column(String(64), primary_key=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<JobState(name={self.name!r}, last_run_at={self.last_run_at})>"
@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, func, CheckConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, func, text, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 from .mixins import TimestampMixin
 
+ACTIVE_LOAN = text('return_date IS NULL')
+
 
 class Loan(Base, TimestampMixin):
     __tablename__ = 'loans'
@@ -11,14 +13,34 @@ class Loan(Base, TimestampMixin):
             '(return_date IS NULL) OR (return_date >= loan_date)',
             name='ck_loans_return_date'
         ),
+        # Only active loans are looked up by reader/book; the returned history
+        # (the bulk of the table) is kept out of these indexes
+        Index(
+            'ix_loans_reader_id_active', 'reader_id',
+            postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN
+        ),
+        Index(
+            'ix_loans_book_id_reader_id_active', 'book_id', 'reader_id',
+            postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN
+        ),
+        # Keyset pagination of a reader's full loan history
+        Index('ix_loans_reader_id_id', 'reader_id', 'id'),
+        # Overdue listing and scan walk active loans by due date
+        Index(
+            'ix_loans_due_date_active', 'due_date', 'id',
+            postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN
+        ),
     )
 
     id = Column(Integer, primary_key=True, index=True)
-    book_id = Column(Integer, ForeignKey('books.id'), nullable=False)
-    reader_id = Column(Integer, ForeignKey('readers.id'), nullable=False)
+    # A deleted book or reader takes its loans with it, in the database
+    book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), nullable=False)
+    reader_id = Column(Integer, ForeignKey('readers.id', ondelete='CASCADE'), nullable=False)
     loan_date = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
+    # loan_date + LOAN_PERIOD_DAYS at checkout
+    due_date = Column(DateTime(timezone=True), nullable=False)
     return_date = Column(DateTime(timezone=True), nullable=True)
 
     book = relationship('Book', back_populates='loans')
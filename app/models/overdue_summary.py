@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.db import Base
+from .mixins import TimestampMixin
+
+
+class OverdueSummary(Base, TimestampMixin):
+    """
+    Overdue loans per reader, maintained by the overdue scan (see OverdueService).
+    Only readers with at least one overdue loan have a row.
+    """
+    __tablename__ = 'overdue_summaries'
+
+    reader_id = Column(Integer, ForeignKey('readers.id', ondelete='CASCADE'), primary_key=True)
+    overdue_loans = Column(Integer, nullable=False)
+    oldest_due_date = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<OverdueSummary(reader_id={self.reader_id}, overdue_loans={self.overdue_loans})>"
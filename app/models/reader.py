@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, UniqueConstraint
+from sqlalchemy import CheckConstraint, Column, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db import Base
 from .mixins import TimestampMixin
@@ -8,15 +8,21 @@ class Reader(Base, TimestampMixin):
     __tablename__ = 'readers'
     __table_args__ = (
         UniqueConstraint('email', name='uq_readers_email'),
+        CheckConstraint('active_loans >= 0', name='ck_readers_active_loans_non_negative'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     email = Column(String(255), nullable=False, index=True)
     phone = Column(String(20), nullable=True)
+    # Loans not returned yet, kept in step with loans by LoanService
+    active_loans = Column(Integer, default=0, server_default='0', nullable=False)
+    # Bumped by every edit of the reader; PUT/PATCH with If-Match compare it
+    version = Column(Integer, default=1, server_default='1', nullable=False)
 
+    # Loans are removed by ON DELETE CASCADE, without loading them
     loans = relationship(
-        'Loan', back_populates='reader', cascade='all, delete-orphan'
+        'Loan', back_populates='reader', cascade='all, delete-orphan', passive_deletes=True
     )
 
     def __repr__(self):
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Index
+from app.db import Base
+from .mixins import TimestampMixin
+
+
+class RevokedToken(Base, TimestampMixin):
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        # Incremental revocation syncs read the rows changed since the last one
+        Index('ix_revoked_tokens_updated_at', 'updated_at'),
+    )
+
+    jti = Column(String(64), primary_key=True)
+    # Rows are useless once the token itself has expired, see purge_expired
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RevokedToken(jti={self.jti!r})>"
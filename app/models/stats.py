@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, Date
+from app.db import Base
+
+
+class DailyBookStats(Base):
+    """
+    Checkouts and returns of a book per day (UTC), kept up to date by LoanService.
+    Rows are historical facts: they outlive the book (no foreign key).
+    """
+    __tablename__ = 'daily_book_stats'
+
+    day = Column(Date, primary_key=True)
+    book_id = Column(Integer, primary_key=True)
+    checkouts = Column(Integer, nullable=False, default=0)
+    returns = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyBookStats(day={self.day}, book_id={self.book_id})>"
+
+
+class DailyReaderStats(Base):
+    """
+    Checkouts and returns of a reader per day (UTC), kept up to date by LoanService.
+    Rows are historical facts: they outlive the reader (no foreign key).
+    """
+    __tablename__ = 'daily_reader_stats'
+
+    day = Column(Date, primary_key=True)
+    reader_id = Column(Integer, primary_key=True)
+    checkouts = Column(Integer, nullable=False, default=0)
+    returns = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyReaderStats(day={self.day}, reader_id={self.reader_id})>"
@@ -1,7 +1,7 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.auth import UserCreate, UserRead, Token
 from app.services.auth_service import AuthService
@@ -20,19 +20,19 @@ router = APIRouter(
     status_code=status.HTTP_201_CREATED,
     summary="Register a new librarian"
 )
-def register(
+async def register(
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """
     Register a new librarian (user) with a hashed password.м.
     """
-    if AuthService.user_exists(db, user_in.email):
+    if await AuthService.user_exists(db, user_in.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    user = AuthService.create_user(db, user_in)
+    user = await AuthService.create_user(db, user_in)
     return user
 
 @router.post(
@@ -40,14 +40,14 @@ def register(
     response_model=Token,
     summary="Authenticate and receive access token"
 )
-def login(
+async def login(
     login_data: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     """
     Authenticate by email and password, return JWT access token.
     """
-    user = AuthService.authenticate_user(db, login_data.email, login_data.password)
+    user = await AuthService.authenticate_user(db, login_data.email, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,11 +65,14 @@ def login(
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Revoke current access token"
 )
-def logout(token: str = Depends(get_token)):
+async def logout(
+    token: str = Depends(get_token),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
     """
     Revoke the current token by adding it to the blacklist.
     """
-    AuthService.revoke_token(token)
+    await AuthService.revoke_token(token, db)
     return {"detail": "Logged out"}
 
 @router.get(
@@ -77,7 +80,7 @@ def logout(token: str = Depends(get_token)):
     response_model=UserRead,
     summary="Get current user"
 )
-def read_current_user(
+async def read_current_user(
     current_user: UserRead = Depends(AuthService.get_current_user)
 ):
     """
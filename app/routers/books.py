@@ -1,45 +1,190 @@
-from typing import List
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.book import BookCreate, BookRead, BookUpdate
+from app.schemas.book import (
+    BookAvailability, BookBatchRequest, BookBatchResult, BookBulkDeleteResult, BookCreate, BookPage, BookRead,
+    BookUpdate, ImportResult
+)
 from app.services.book_service import BookService
+from app.services.export_service import ExportFormat
+from app.services.import_service import ImportService
+from app.core.cache import book_cache
+from app.core.config import settings
+from app.core.serialization import ORJSONResponse, columns_for
 from app.core.security import get_current_user
-from app.utils import get_by_id_or_404
-from app.models.book import Book
+from app.utils import encode_cursor, decode_cursor, not_modified, parse_ids
 from app.db import get_db
+from app.models.book import Book
 
 router = APIRouter(
     prefix="/books",
     tags=["books"],
 )
 
+def catalog_headers(etag: str, last_modified: Optional[str]) -> dict:
+    """
+    Validator and caching headers of public catalog responses, 304s included.
+    """
+    headers = {"ETag": f'"{etag}"'}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if settings.CATALOG_CACHE_CONTROL:
+        headers["Cache-Control"] = settings.CATALOG_CACHE_CONTROL
+    return headers
+
 @router.get(
     "/",
-    response_model=List[BookRead],
+    response_model=BookPage,
     summary="Book list"
 )
-def read_books(
-    db: Session = Depends(get_db)
-) -> List[BookRead]:
+async def read_books(
+    response: Response,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    author: Optional[str] = None,
+    published_year_from: Optional[int] = None,
+    published_year_to: Optional[int] = None,
+    isbn: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> BookPage:
     """
-    Get a list of all books.
+    Get a page of books ordered by ID, optionally filtered by author, publication year range and ISBN.
+    Supports If-None-Match, answered without loading the books. Pages carry no
+    Last-Modified: the newest updated_at of a page cannot tell that a book was
+    deleted from it, so only the ETag decides.
     """
-    return BookService.list_books(db)
+    after_id = None
+    if after is not None:
+        after_id = decode_cursor(after).get("id")
+        if not isinstance(after_id, int):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    filters = dict(
+        limit=limit,
+        after=after_id,
+        author=author,
+        published_year_from=published_year_from,
+        published_year_to=published_year_to,
+        isbn=isbn,
+    )
+    etag = await BookService.get_list_etag(db, **filters)
+    headers = catalog_headers(etag, None)
+    if not_modified(if_none_match, None, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    fast = settings.FAST_LIST_SERIALIZATION
+    books, next_id = await BookService.list_books(
+        db, columns=columns_for(Book, BookRead) if fast else None, **filters
+    )
+    next_cursor = encode_cursor({"id": next_id}) if next_id is not None else None
+    if fast:
+        return ORJSONResponse({"items": books, "next_cursor": next_cursor}, headers=headers)
+    response.headers.update(headers)
+    return {"items": books, "next_cursor": next_cursor}
+
+@router.get(
+    "/search",
+    response_model=BookPage,
+    summary="Full-text book search"
+)
+async def search_books(
+    q: str = Query(..., min_length=1, description="Words to look for in title, author and description"),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> BookPage:
+    """
+    Search books by title, author and description, ranked by relevance.
+    """
+    offset = 0
+    if after is not None:
+        offset = decode_cursor(after).get("offset")
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    books, has_more = await BookService.search_books(db, q, limit=limit, offset=offset)
+    next_cursor = encode_cursor({"offset": offset + limit}) if has_more else None
+    return {"items": books, "next_cursor": next_cursor}
+
+@router.get(
+    "/availability",
+    response_model=List[BookAvailability],
+    summary="Availability of several books"
+)
+async def read_availability(
+    ids: List[int] = Query(..., description="Book IDs, repeated: ?ids=1&ids=2"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> List[BookAvailability]:
+    """
+    Get total, available and on-loan copies of the given books in one request.
+    Unknown IDs are left out of the result.
+    """
+    if len(ids) > settings.MAX_PAGE_SIZE:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MAX_PAGE_SIZE} ids per request"
+        )
+    return await BookService.get_availability(db, ids)
+
+@router.get(
+    "/batch",
+    response_model=BookBatchResult,
+    summary="Get several books by ID"
+)
+async def read_books_batch(
+    ids: List[str] = Query(..., description="Book IDs, comma-separated: ?ids=1,2,3 (or repeated)"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> BookBatchResult:
+    """
+    Get the given books with a single query, in the order requested. Each
+    ID gets an item with the book, or a 404 status if there is no such book.
+    """
+    return await BookService.get_books_batch(db, parse_ids(ids, settings.MAX_PAGE_SIZE))
+
+@router.post(
+    "/batch",
+    response_model=BookBatchResult,
+    summary="Get several books by ID (long lists)"
+)
+async def read_books_batch_post(
+    batch: BookBatchRequest,
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> BookBatchResult:
+    """
+    Same as GET /books/batch, with the IDs in the body for lists too long for a URL.
+    """
+    return await BookService.get_books_batch(db, batch.ids)
+
+@router.get(
+    "/cache/stats",
+    summary="Book cache counters",
+    dependencies=[Depends(get_current_user)]
+)
+async def read_book_cache_stats() -> dict:
+    """
+    Get hit/miss counters of the book read cache.
+    """
+    return book_cache.stats()
 
 @router.get(
     "/{book_id}",
     response_model=BookRead,
     summary="Get a book by ID"
 )
-def read_book(
+async def read_book(
     book_id: int,
-    db: Session = Depends(get_db)
-) -> BookRead:
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> Response:
     """
-    Get a single book by its ID.
+    Get a single book by its ID. Served from the book cache; supports
+    If-None-Match and If-Modified-Since.
     """
-    return get_by_id_or_404(db, Book, book_id)
+    etag, last_modified, body = await BookService.get_book_cached(db, book_id)
+    headers = catalog_headers(etag, last_modified)
+    if not_modified(if_none_match, if_modified_since, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post(
     "/",
@@ -48,14 +193,36 @@ def read_book(
     summary="Create a new book",
     dependencies=[Depends(get_current_user)]
 )
-def create_book(
+async def create_book(
     book_in: BookCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> BookRead:
     """
     Add a new book to the catalog.
     """
-    return BookService.create_book(db, book_in)
+    return await BookService.create_book(db, book_in)
+
+@router.post(
+    "/import",
+    response_model=ImportResult,
+    summary="Bulk import books",
+    dependencies=[Depends(get_current_user)]
+)
+async def import_books(
+    request: Request,
+    format: ExportFormat = ExportFormat.ndjson,
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> ImportResult:
+    """
+    Load books from an NDJSON (default) or CSV request body, streamed as it arrives.
+    Books whose ISBN is already in the catalog are updated. Invalid rows are skipped
+    and reported with their line numbers.
+
+    Rows are committed in chunks, not all at once. If storing a chunk fails, the
+    import stops and `aborted` says why; the `imported` rows before it remain
+    stored. The response is still a 200, as it reports what was stored.
+    """
+    return await ImportService.import_books(db, request.stream(), format)
 
 @router.put(
     "/{book_id}",
@@ -63,15 +230,65 @@ def create_book(
     summary="Update a book",
     dependencies=[Depends(get_current_user)]
 )
-def update_book(
+async def update_book(
+    book_id: int,
+    book_in: BookUpdate,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> BookRead:
+    """
+    Update the data of a book by ID. If-Match works as on PATCH.
+    """
+    version = await BookService.if_match_version(db, book_id, if_match)
+    return await BookService.update_book(db, book_id, book_in, version)
+
+@router.patch(
+    "/{book_id}",
+    response_model=BookRead,
+    summary="Partially update a book",
+    dependencies=[Depends(get_current_user)]
+)
+async def patch_book(
     book_id: int,
     book_in: BookUpdate,
-    db: Session = Depends(get_db)
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> BookRead:
     """
-    Update the data of a book by ID.
+    Change only the fields sent, in a single UPDATE. With If-Match set to the
+    book's `version` or to the ETag of GET /books/{id}, the change is applied
+    only if nobody edited the book since (412 Precondition Failed otherwise).
+    """
+    version = await BookService.if_match_version(db, book_id, if_match)
+    return await BookService.update_book(db, book_id, book_in, version)
+
+@router.delete(
+    "/",
+    response_model=BookBulkDeleteResult,
+    summary="Delete several books",
+    dependencies=[Depends(get_current_user)]
+)
+async def delete_books(
+    ids: List[int] = Query(..., min_length=1, description="Book IDs, repeated: ?ids=1&ids=2"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> BookBulkDeleteResult:
+    """
+    Delete the given books, with their loans, in one transaction. The number
+    of statements does not grow with the number of books or loans.
+    Unknown IDs are listed as not found. Note the trailing slash: this is
+    `DELETE /books/?ids=...`, not `DELETE /books/{book_id}`; a request
+    without IDs is rejected with 422 and deletes nothing.
     """
-    return BookService.update_book(db, book_id, book_in)
+    if len(ids) > settings.MAX_PAGE_SIZE:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MAX_PAGE_SIZE} ids per request"
+        )
+    deleted = set(await BookService.delete_books(db, ids))
+    return BookBulkDeleteResult(
+        deleted=[book_id for book_id in dict.fromkeys(ids) if book_id in deleted],
+        not_found=[book_id for book_id in dict.fromkeys(ids) if book_id not in deleted],
+    )
 
 @router.delete(
     "/{book_id}",
@@ -79,11 +296,11 @@ def update_book(
     summary="Delete a book",
     dependencies=[Depends(get_current_user)]
 )
-def delete_book(
+async def delete_book(
     book_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> None:
     """
     Delete a book by its ID.
     """
-    BookService.delete_book(db, book_id)
+    await BookService.delete_book(db, book_id)
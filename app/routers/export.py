@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.export_service import ExportService, ExportEntity, ExportFormat
+from app.core.security import get_current_user
+from app.db import get_db
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    dependencies=[Depends(get_current_user)]
+)
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+@router.get(
+    "/{entity}",
+    response_class=StreamingResponse,
+    summary="Stream a full table dump"
+)
+async def export_entity(
+    entity: ExportEntity,
+    format: ExportFormat = ExportFormat.ndjson,
+    # The session must outlive the handler: the dump is read while the body streams
+    db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Stream all books, readers or loans as NDJSON (default) or CSV.
+    """
+    return StreamingResponse(
+        ExportService.stream(db, entity, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{entity.value}.{format.value}"'}
+    )
@@ -1,12 +1,22 @@
-from typing import List
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.loan import LoanCreate, LoanRead, LoanReturn
+from app.schemas.loan import (
+    LoanBulkCreate, LoanBulkResult, LoanBulkReturn, LoanCreate, LoanRead, LoanReturn,
+    LoanHistoryItem, LoanHistoryPage, LoanReaderSummary, LoanStatus,
+    OverdueLoanItem, OverdueLoanPage, OverdueReport
+)
 from app.schemas.book import BookRead
 from app.services.loan_service import LoanService
+from app.services.overdue_service import OverdueService
+from app.core.config import settings
 from app.core.security import get_current_user
+from app.core.serialization import ORJSONResponse, columns_for
 from app.db import get_db
+from app.models.loan import Loan
+from app.utils import decode_cursor, encode_cursor, render_page
 
 router = APIRouter(
     prefix="/loans",
@@ -20,39 +30,159 @@ router = APIRouter(
     status_code=status.HTTP_201_CREATED,
     summary="Create a new loan"
 )
-def create_loan(
+async def create_loan(
     loan_in: LoanCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> LoanRead:
     """
     Loan a book to a reader.
     """
-    return LoanService.create_loan(db, loan_in)
+    return await LoanService.create_loan(db, loan_in)
 
 @router.post(
     "/return",
     response_model=LoanReturn,
     summary="Return a loaned book"
 )
-def return_loan(
+async def return_loan(
     loan_in: LoanReturn,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> LoanRead:
     """
     Return a loaned book.
     """
-    return LoanService.return_loan(db, loan_in)
+    return await LoanService.return_loan(db, loan_in)
+
+@router.post(
+    "/bulk",
+    response_model=LoanBulkResult,
+    summary="Loan several books to a reader"
+)
+async def create_loans_bulk(
+    loans_in: LoanBulkCreate,
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> LoanBulkResult:
+    """
+    Loan a stack of books to one reader in a single transaction.
+    Each book gets its own status code: 201, or the error a single loan would return.
+    """
+    return await LoanService.create_loans_bulk(db, loans_in)
+
+@router.post(
+    "/return/bulk",
+    response_model=LoanBulkResult,
+    summary="Return several loaned books"
+)
+async def return_loans_bulk(
+    loans_in: LoanBulkReturn,
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> LoanBulkResult:
+    """
+    Return a stack of books of one reader in a single transaction.
+    Each book gets its own status code: 200, or 404 if the reader has no active loan of it.
+    """
+    return await LoanService.return_loans_bulk(db, loans_in)
+
+@router.get(
+    "/overdue",
+    response_model=OverdueLoanPage,
+    summary="Overdue loans"
+)
+async def read_overdue_loans(
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> Response:
+    """
+    Get a page of loans past their due date, longest overdue first, with book and reader.
+    """
+    position = None
+    if after is not None:
+        cursor = decode_cursor(after)
+        try:
+            position = (datetime.fromisoformat(cursor["due"]), cursor["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if not isinstance(position[1], int):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    loans, has_more = await OverdueService.list_overdue(db, limit=limit, after=position)
+    body = render_page(
+        [OverdueLoanItem.model_validate(loan) for loan in loans],
+        cursor_for=lambda item: encode_cursor({"due": item.due_date.isoformat(), "id": item.id}),
+        has_more=has_more,
+        max_bytes=settings.MAX_PAGE_BYTES,
+    )
+    return Response(content=body, media_type="application/json")
+
+@router.get(
+    "/overdue/summary",
+    response_model=OverdueReport,
+    summary="Overdue loans report"
+)
+async def read_overdue_report(
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> OverdueReport:
+    """
+    Get overdue totals and the readers with most overdue loans, as of the last overdue scan.
+    """
+    return await OverdueService.report(db, limit)
 
 @router.get(
     "/{reader_id}",
     response_model=List[LoanRead],
     summary="Active loan list by reader"
 )
-def get_loans_by_reader(
+async def get_loans_by_reader(
     reader_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> List[LoanRead]:
     """
     Get all currently loaned books for a reader.
     """
-    return LoanService.get_loans_by_reader(db, reader_id)
+    if settings.FAST_LIST_SERIALIZATION:
+        return ORJSONResponse(
+            await LoanService.get_loans_by_reader(db, reader_id, columns_for(Loan, LoanRead))
+        )
+    return await LoanService.get_loans_by_reader(db, reader_id)
+
+@router.get(
+    "/{reader_id}/history",
+    response_model=LoanHistoryPage,
+    summary="Loan history of a reader"
+)
+async def read_loan_history(
+    reader_id: int,
+    loan_status: LoanStatus = Query(LoanStatus.all, alias="status"),
+    loaned_from: Optional[datetime] = None,
+    loaned_to: Optional[datetime] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> Response:
+    """
+    Get a page of a reader's loans, newest first, with the title and author of each book.
+    Pages larger than MAX_PAGE_BYTES end early; next_cursor continues after them.
+    """
+    after_id = None
+    if after is not None:
+        after_id = decode_cursor(after).get("id")
+        if not isinstance(after_id, int):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    reader, loans, has_more = await LoanService.get_loan_history(
+        db,
+        reader_id,
+        limit=limit,
+        after=after_id,
+        loan_status=loan_status,
+        loaned_from=loaned_from,
+        loaned_to=loaned_to,
+    )
+    body = render_page(
+        [LoanHistoryItem.model_validate(loan) for loan in loans],
+        cursor_for=lambda item: encode_cursor({"id": item.id}),
+        has_more=has_more,
+        max_bytes=settings.MAX_PAGE_BYTES,
+        reader=LoanReaderSummary.model_validate(reader),
+    )
+    return Response(content=body, media_type="application/json")
@@ -1,11 +1,13 @@
-from typing import List
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.reader import ReaderCreate, ReaderRead, ReaderUpdate
+from app.schemas.reader import ReaderBatchRequest, ReaderBatchResult, ReaderCreate, ReaderRead, ReaderUpdate
 from app.services.reader_service import ReaderService
+from app.core.config import settings
 from app.core.security import get_current_user
-from app.utils import get_by_id_or_404
+from app.core.serialization import ORJSONResponse, columns_for
+from app.utils import get_by_id_or_404, if_match_version, parse_ids
 from app.models.reader import Reader
 from app.db import get_db
 
@@ -21,67 +23,117 @@ router = APIRouter(
     status_code=status.HTTP_201_CREATED,
     summary="Create a new reader"
 )
-def create_reader(
+async def create_reader(
     reader_in: ReaderCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> ReaderRead:
     """
     Add a new reader.
     """
-    return ReaderService.create_reader(db, reader_in)
+    return await ReaderService.create_reader(db, reader_in)
 
 @router.get(
     "/",
     response_model=List[ReaderRead],
     summary="Reader list"
 )
-def read_readers(
-    db: Session = Depends(get_db)
+async def read_readers(
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> List[ReaderRead]:
     """
     Get a list of all readers.
     """
-    return ReaderService.list_readers(db)
+    if settings.FAST_LIST_SERIALIZATION:
+        return ORJSONResponse(await ReaderService.list_readers(db, columns_for(Reader, ReaderRead)))
+    return await ReaderService.list_readers(db)
+
+@router.get(
+    "/batch",
+    response_model=ReaderBatchResult,
+    summary="Get several readers by ID"
+)
+async def read_readers_batch(
+    ids: List[str] = Query(..., description="Reader IDs, comma-separated: ?ids=1,2,3 (or repeated)"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> ReaderBatchResult:
+    """
+    Get the given readers with a single query, in the order requested. Each
+    ID gets an item with the reader, or a 404 status if there is no such reader.
+    """
+    return await ReaderService.get_readers_batch(db, parse_ids(ids, settings.MAX_PAGE_SIZE))
+
+@router.post(
+    "/batch",
+    response_model=ReaderBatchResult,
+    summary="Get several readers by ID (long lists)"
+)
+async def read_readers_batch_post(
+    batch: ReaderBatchRequest,
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> ReaderBatchResult:
+    """
+    Same as GET /readers/batch, with the IDs in the body for lists too long for a URL.
+    """
+    return await ReaderService.get_readers_batch(db, batch.ids)
 
 @router.get(
     "/{reader_id}",
     response_model=ReaderRead,
     summary="Get a reader by ID"
 )
-def read_reader(
+async def read_reader(
     reader_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> ReaderRead:
     """
     Get a single reader by ID.
     """
-    return get_by_id_or_404(db, Reader, reader_id)
+    return await get_by_id_or_404(db, Reader, reader_id)
 
 @router.put(
     "/{reader_id}",
     response_model=ReaderRead,
     summary="Update a reader"
 )
-def update_reader(
+async def update_reader(
     reader_id: int,
     reader_in: ReaderUpdate,
-    db: Session = Depends(get_db)
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> ReaderRead:
     """
     Update the data of a reader by ID.
     """
-    return ReaderService.update_reader(db, reader_id, reader_in)
+    return await ReaderService.update_reader(db, reader_id, reader_in, if_match_version(if_match))
+
+@router.patch(
+    "/{reader_id}",
+    response_model=ReaderRead,
+    summary="Partially update a reader"
+)
+async def patch_reader(
+    reader_id: int,
+    reader_in: ReaderUpdate,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> ReaderRead:
+    """
+    Change only the fields sent, in a single UPDATE. With If-Match set to the
+    reader's `version`, the change is applied only if nobody edited the reader
+    since (412 Precondition Failed otherwise).
+    """
+    return await ReaderService.update_reader(db, reader_id, reader_in, if_match_version(if_match))
 
 @router.delete(
     "/{reader_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete a reader"
 )
-def delete_reader(
+async def delete_reader(
     reader_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ) -> None:
     """
     Delete a reader by ID.
     """
-    ReaderService.delete_reader(db, reader_id)
+    await ReaderService.delete_reader(db, reader_id)
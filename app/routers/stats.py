@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.stats import DailyCirculation, TopBook, TopReader
+from app.services.stats_service import StatsService
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.db import get_db
+
+# Longest window the statistics endpoints accept, in days
+MAX_STATS_DAYS = 366
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+    dependencies=[Depends(get_current_user)]
+)
+
+@router.get(
+    "/books/top",
+    response_model=List[TopBook],
+    summary="Most borrowed books"
+)
+async def read_top_books(
+    days: int = Query(30, ge=1, le=MAX_STATS_DAYS, description="Window ending today, in days"),
+    limit: int = Query(10, ge=1, le=settings.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> List[TopBook]:
+    """
+    Get the books with most checkouts over the last `days` days.
+    """
+    return await StatsService.top_books(db, days, limit)
+
+@router.get(
+    "/readers/top",
+    response_model=List[TopReader],
+    summary="Busiest readers"
+)
+async def read_top_readers(
+    days: int = Query(30, ge=1, le=MAX_STATS_DAYS, description="Window ending today, in days"),
+    limit: int = Query(10, ge=1, le=settings.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> List[TopReader]:
+    """
+    Get the readers with most checkouts over the last `days` days.
+    """
+    return await StatsService.top_readers(db, days, limit)
+
+@router.get(
+    "/daily",
+    response_model=List[DailyCirculation],
+    summary="Daily checkouts and returns"
+)
+async def read_daily_circulation(
+    date_from: Optional[date] = Query(None, description="Defaults to 30 days before date_to"),
+    date_to: Optional[date] = Query(None, description="Defaults to today (UTC)"),
+    db: AsyncSession = Depends(get_db, scope="function")
+) -> List[DailyCirculation]:
+    """
+    Get checkout and return counts per day in the range, inclusive.
+    """
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from must not be after date_to"
+        )
+    if (date_to - date_from).days >= MAX_STATS_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The range may span at most {MAX_STATS_DAYS} days"
+        )
+    return await StatsService.daily(db, date_from, date_to)
@@ -1,12 +1,15 @@
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, conlist
+
+from app.core.config import settings
 
 
 class BookBase(BaseModel):
-    title: str
-    author: str
-    published_year: Optional[int] = None
-    isbn: Optional[str] = None
+    # Limits mirror the books table, so bad rows fail validation rather than the INSERT
+    title: str = Field(..., max_length=255)
+    author: str = Field(..., max_length=255)
+    published_year: Optional[int] = Field(None, ge=0)
+    isbn: Optional[str] = Field(None, max_length=20)
     copies: int = Field(1, ge=0)
     description: Optional[str] = None
 
@@ -16,16 +19,66 @@ class BookCreate(BookBase):
 
 
 class BookUpdate(BaseModel):
-    title: Optional[str]
-    author: Optional[str]
-    published_year: Optional[int]
-    isbn: Optional[str]
+    title: Optional[str] = None
+    author: Optional[str] = None
+    published_year: Optional[int] = None
+    isbn: Optional[str] = None
     copies: Optional[int] = Field(None, ge=0)
-    description: Optional[str]
+    description: Optional[str] = None
 
 
 class BookRead(BookBase):
     id: int
+    total_copies: int
+    version: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BookPage(BaseModel):
+    items: List[BookRead]
+    next_cursor: Optional[str] = None
+
+
+class BookBatchRequest(BaseModel):
+    ids: conlist(int, min_length=1, max_length=settings.MAX_PAGE_SIZE)
+
+
+class BookBatchItem(BaseModel):
+    """One requested ID of a batch fetch: the book, or the error its GET would have returned."""
+    id: int
+    status_code: int
+    detail: Optional[str] = None
+    book: Optional[BookRead] = None
+
+
+class BookBatchResult(BaseModel):
+    results: List[BookBatchItem]
+
+
+class BookBulkDeleteResult(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
+
+
+class BookAvailability(BaseModel):
+    id: int
+    total_copies: int
+    available_copies: int
+    on_loan: int
+
+
+class ImportRowError(BaseModel):
+    line: int
+    errors: List[str]
+
 
-    class Config:
-        orm_mode = True
+class ImportResult(BaseModel):
+    rows: int = 0
+    # Rows stored; each chunk is committed on its own, so these stay stored
+    # even if the import is aborted later
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    # Why the import stopped before the end of the input, if it did
+    aborted: Optional[str] = None
@@ -1,6 +1,9 @@
-from typing import Optional
+from enum import Enum
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, conlist, field_validator
+
+from app.schemas.types import IsoDateTime
 
 
 class LoanBase(BaseModel):
@@ -13,20 +16,109 @@ class LoanCreate(LoanBase):
 
 
 class LoanUpdate(BaseModel):
-    return_date: Optional[datetime]
+    return_date: Optional[datetime] = None
 
 
 class LoanRead(LoanBase):
     id: int
-    loan_date: datetime
-    return_date: Optional[datetime] = None
+    loan_date: IsoDateTime
+    due_date: IsoDateTime
+    return_date: Optional[IsoDateTime] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class LoanReturn(BaseModel):
     book_id: int
     reader_id: int
     return_date: Optional[datetime] = None
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LoanBulkCreate(BaseModel):
+    reader_id: int
+    book_ids: conlist(int, min_length=1, max_length=100)
+
+    @field_validator("book_ids")
+    @classmethod
+    def book_ids_unique(cls, book_ids: List[int]) -> List[int]:
+        # Each book gets one result, a repeated id would have two
+        if len(set(book_ids)) != len(book_ids):
+            raise ValueError("book_ids must not contain duplicates")
+        return book_ids
+
+
+class LoanBulkReturn(LoanBulkCreate):
+    return_date: Optional[datetime] = None
+
+
+class LoanBulkItem(BaseModel):
+    """Outcome of one book of a bulk request: the loan, or the error it would have raised."""
+    book_id: int
+    status_code: int
+    detail: Optional[str] = None
+    loan: Optional[LoanRead] = None
+
+
+class LoanBulkResult(BaseModel):
+    results: List[LoanBulkItem]
+
+
+class LoanStatus(str, Enum):
+    active = "active"
+    returned = "returned"
+    all = "all"
+
+
+class LoanBookSummary(BaseModel):
+    id: int
+    title: str
+    author: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LoanReaderSummary(BaseModel):
+    id: int
+    name: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LoanHistoryItem(BaseModel):
+    id: int
+    loan_date: IsoDateTime
+    due_date: IsoDateTime
+    return_date: Optional[IsoDateTime] = None
+    book: LoanBookSummary
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LoanHistoryPage(BaseModel):
+    reader: LoanReaderSummary
+    items: List[LoanHistoryItem]
+    next_cursor: Optional[str] = None
+
+
+class OverdueLoanItem(LoanHistoryItem):
+    reader: LoanReaderSummary
+
+
+class OverdueLoanPage(BaseModel):
+    items: List[OverdueLoanItem]
+    next_cursor: Optional[str] = None
+
+
+class OverdueReaderSummary(BaseModel):
+    reader_id: int
+    overdue_loans: int
+    oldest_due_date: IsoDateTime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OverdueReport(BaseModel):
+    scanned_at: Optional[IsoDateTime] = None
+    overdue_loans: int
+    readers: int
+    items: List[OverdueReaderSummary]
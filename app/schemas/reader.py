@@ -1,5 +1,7 @@
-from typing import Optional
-from pydantic import BaseModel, EmailStr
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, conlist
+
+from app.core.config import settings
 
 
 class ReaderBase(BaseModel):
@@ -13,13 +15,29 @@ class ReaderCreate(ReaderBase):
 
 
 class ReaderUpdate(BaseModel):
-    name: Optional[str]
-    email: Optional[EmailStr]
-    phone: Optional[str]
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
 
 
 class ReaderRead(ReaderBase):
     id: int
+    version: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ReaderBatchRequest(BaseModel):
+    ids: conlist(int, min_length=1, max_length=settings.MAX_PAGE_SIZE)
+
+
+class ReaderBatchItem(BaseModel):
+    """One requested ID of a batch fetch: the reader, or the error its GET would have returned."""
+    id: int
+    status_code: int
+    detail: Optional[str] = None
+    reader: Optional[ReaderRead] = None
+
 
-    class Config:
-        orm_mode = True
+class ReaderBatchResult(BaseModel):
+    results: List[ReaderBatchItem]
@@ -0,0 +1,21 @@
+from datetime import date
+from pydantic import BaseModel
+
+
+class TopBook(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    checkouts: int
+
+
+class TopReader(BaseModel):
+    reader_id: int
+    name: str
+    checkouts: int
+
+
+class DailyCirculation(BaseModel):
+    day: date
+    checkouts: int
+    returns: int
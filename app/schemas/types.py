@@ -0,0 +1,13 @@
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import PlainSerializer, WithJsonSchema
+
+# Response datetimes in JSON as datetime.isoformat() gives them ("+00:00" rather
+# than "Z" for UTC), as the API has always returned them and the orjson fast
+# path does
+IsoDateTime = Annotated[
+    datetime,
+    PlainSerializer(lambda value: value.isoformat(), return_type=str, when_used="json"),
+    WithJsonSchema({"type": "string", "format": "date-time"}, mode="serialization"),
+]
@@ -3,16 +3,17 @@ from typing import Optional
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
+from app.db import commit, get_db
 from app.models.user import User
 from app.schemas.auth import UserCreate, Token
 from app.core.config import settings
 from app.core.security import (
-    get_password_hash, verify_password,
+    Principal, get_password_hash, verify_and_update_password,
     create_access_token, get_current_user as security_get_current_user,
-    get_token, revoke_token as security_revoke_token
+    get_token, invalidate_user_principals, revoke_token as security_revoke_token
 )
 
 
@@ -22,26 +23,44 @@ class AuthService:
     """
 
     @staticmethod
-    def user_exists(db: Session, email: str) -> bool:
+    async def user_exists(db: AsyncSession, email: str) -> bool:
         """Check if user with given email exists."""
-        return db.query(User).filter(User.email == email).first() is not None
+        return await db.scalar(select(User.id).where(User.email == email)) is not None
 
     @staticmethod
-    def create_user(db: Session, user_in: UserCreate) -> User:
+    async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
         """Create and store a new user with a hashed password."""
-        hashed_password = get_password_hash(user_in.password)
-        user = User(email=user_in.email, hashed_password=hashed_password)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+        hashed_password = await get_password_hash(user_in.password)
+        user = await db.scalar(
+            insert(User).values(email=user_in.email, hashed_password=hashed_password).returning(User)
+        )
+        await commit(db)
         return user
 
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Validate email and password, return user on success or None."""
-        user = db.query(User).filter(User.email == email).first()
-        if not user or not verify_password(password, user.hashed_password):
+        user = await db.scalar(select(User).where(User.email == email))
+        if not user:
             return None
+        valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+        if not valid:
+            return None
+        if new_hash:
+            # Stored hash predates the current bcrypt cost: upgrade it transparently
+            user.hashed_password = new_hash
+            await commit(db)
+        return user
+
+    @staticmethod
+    async def set_user_active(db: AsyncSession, email: str, is_active: bool) -> Optional[User]:
+        """Activate or deactivate a user, dropping their cached principals in every worker."""
+        user = await db.scalar(
+            update(User).where(User.email == email).values(is_active=is_active).returning(User)
+        )
+        if user is not None:
+            await invalidate_user_principals(db, user.id)
+            await commit(db)
         return user
 
     @staticmethod
@@ -50,14 +69,14 @@ class AuthService:
         return create_access_token(data=data, expires_delta=expires_delta)
 
     @classmethod
-    def get_current_user(cls,
-                         token: str = Depends(get_token),
-                         db: Session = Depends(get_db)
-                         ) -> User:
+    async def get_current_user(cls,
+                               token: str = Depends(get_token),
+                               db: AsyncSession = Depends(get_db, scope="function")
+                               ) -> Principal:
         """Delegate token decoding and user lookup to security module."""
-        return security_get_current_user(token=token, db=db)
+        return await security_get_current_user(token=token, db=db)
 
     @staticmethod
-    def revoke_token(token: str) -> None:
+    async def revoke_token(token: str, db: AsyncSession) -> None:
         """Delegate token revocation to security module."""
-        security_revoke_token(token)
+        await security_revoke_token(token, db)
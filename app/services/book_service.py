@@ -1,38 +1,262 @@
-from typing import List
+import hashlib
+import re
+from typing import List, Optional, Sequence, Tuple
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import column, delete, func, insert, literal_column, select, table, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.book import Book
-from app.schemas.book import BookCreate, BookUpdate, BookRead
-from app.utils import get_by_id_or_404
+from app.core.cache import book_cache
+from app.db import after_commit, commit
+from app.models.book import Book, SEARCH_TS_CONFIG
+from app.models.loan import Loan
+from app.models.reader import Reader
+from app.schemas.book import (
+    BookAvailability, BookBatchItem, BookBatchResult, BookCreate, BookUpdate, BookRead
+)
+from app.utils import get_by_id_or_404, http_date, if_match_version, update_by_id_or_404
 
 class BookService:
     """
     Business logic for managing books.
     """
+    # How long an invalidated book stays uncacheable, see get_book_cached
+    CACHE_LEASE_SECONDS = 5
+
+    @staticmethod
+    async def list_books(
+        db: AsyncSession,
+        limit: int,
+        after: Optional[int] = None,
+        author: Optional[str] = None,
+        published_year_from: Optional[int] = None,
+        published_year_to: Optional[int] = None,
+        isbn: Optional[str] = None,
+        columns: Optional[Sequence] = None,
+    ) -> Tuple[List[BookRead], Optional[int]]:
+        """
+        Return one keyset page of books ordered by id and the id to continue after.
+        With `columns` (which must include Book.id) the page holds rows of
+        those columns instead of Book objects.
+        """
+        stmt = select(*columns) if columns else select(Book)
+        if after is not None:
+            stmt = stmt.where(Book.id > after)
+        if author is not None:
+            stmt = stmt.where(Book.author == author)
+        if published_year_from is not None:
+            stmt = stmt.where(Book.published_year >= published_year_from)
+        if published_year_to is not None:
+            stmt = stmt.where(Book.published_year <= published_year_to)
+        if isbn is not None:
+            stmt = stmt.where(Book.isbn == isbn)
+        # Fetch one extra row to learn whether another page exists
+        stmt = stmt.order_by(Book.id).limit(limit + 1)
+        books = (await db.execute(stmt)).all() if columns else (await db.scalars(stmt)).all()
+        if len(books) > limit:
+            return books[:limit], books[limit - 1].id
+        return books, None
+
+    @staticmethod
+    async def search_books(
+        db: AsyncSession,
+        q: str,
+        limit: int,
+        offset: int = 0,
+    ) -> Tuple[List[BookRead], bool]:
+        """
+        Return one page of books matching the full-text query, best match first,
+        and whether more results follow.
+        """
+        if db.bind.dialect.name == 'postgresql':
+            vector = literal_column('books.search_vector')
+            tsquery = func.websearch_to_tsquery(SEARCH_TS_CONFIG, q)
+            stmt = (
+                select(Book)
+                .where(vector.op('@@')(tsquery))
+                .order_by(func.ts_rank_cd(vector, tsquery).desc(), Book.id)
+            )
+        else:
+            # Quote every term so user input is never parsed as FTS5 query syntax
+            terms = re.findall(r'\w+', q)
+            if not terms:
+                return [], False
+            match = ' '.join(f'"{term}"' for term in terms)
+            fts = table('books_fts', column('rowid'), column('rank'))
+            stmt = (
+                select(Book)
+                .join(fts, fts.c.rowid == Book.id)
+                .where(literal_column('books_fts').op('MATCH')(match))
+                .order_by(fts.c.rank, Book.id)
+            )
+        books = (await db.scalars(stmt.offset(offset).limit(limit + 1))).all()
+        return books[:limit], len(books) > limit
+
+    @staticmethod
+    async def get_availability(db: AsyncSession, book_ids: List[int]) -> List[BookAvailability]:
+        """
+        Return total, available and on-loan copies of the given books, ordered by id.
+        Unknown ids are left out.
+        """
+        rows = await db.execute(
+            select(Book.id, Book.total_copies, Book.copies)
+            .where(Book.id.in_(book_ids))
+            .order_by(Book.id)
+        )
+        return [
+            BookAvailability(id=id, total_copies=total, available_copies=available, on_loan=total - available)
+            for id, total, available in rows
+        ]
+
+    @staticmethod
+    async def get_books_batch(db: AsyncSession, book_ids: Sequence[int]) -> BookBatchResult:
+        """
+        Return the given books with one IN query, in request order; unknown
+        IDs get a 404 item instead of a book.
+        """
+        books = {
+            book.id: book
+            for book in (await db.scalars(select(Book).where(Book.id.in_(list(dict.fromkeys(book_ids)))))).all()
+        }
+        return BookBatchResult(results=[
+            BookBatchItem(id=book_id, status_code=status.HTTP_200_OK, book=BookRead.model_validate(books[book_id]))
+            if book_id in books else
+            BookBatchItem(
+                id=book_id, status_code=status.HTTP_404_NOT_FOUND, detail=f"Book with id={book_id} not found"
+            )
+            for book_id in book_ids
+        ])
+
+    @staticmethod
+    async def get_book_cached(db: AsyncSession, book_id: int) -> Tuple[str, str, bytes]:
+        """
+        Return (etag, Last-Modified date, JSON body) of a book, loading and
+        serializing it only on a cache miss.
+
+        A miss only fills an empty slot: invalidation leaves an empty entry
+        for CACHE_LEASE_SECONDS, so a read that loaded the book before a
+        write committed cannot cache its stale copy over the invalidation.
+        """
+        key = str(book_id)
+        entry = await book_cache.get(key)
+        if entry:
+            etag, last_modified, body = entry.split(b"\n", 2)
+            return etag.decode(), last_modified.decode(), body
+        book = await get_by_id_or_404(db, Book, book_id)
+        body = BookRead.model_validate(book).model_dump_json().encode()
+        etag, last_modified = hashlib.sha1(body).hexdigest(), http_date(book.updated_at)
+        if entry is None:
+            await book_cache.add(key, b"\n".join([etag.encode(), last_modified.encode(), body]))
+        return etag, last_modified, body
+
+    @staticmethod
+    async def if_match_version(db: AsyncSession, book_id: int, if_match: Optional[str]) -> Optional[int]:
+        """
+        Version a book's If-Match header requires, or None if there is no
+        header or it is `*`. The header may carry the book's `version` (`"3"`)
+        or an ETag of GET /books/{id}; a current ETag stands for the version it
+        was served with. Raises HTTPException 412 for any other ETag.
+        """
+        if if_match is None or if_match.strip() == "*" or if_match.strip().strip('"').isdigit():
+            return if_match_version(if_match)
+        etag, _, body = await BookService.get_book_cached(db, book_id)
+        # If-Match compares strongly: weak (W/) tags never match
+        if f'"{etag}"' not in (candidate.strip() for candidate in if_match.split(",")):
+            raise HTTPException(status.HTTP_412_PRECONDITION_FAILED, detail="ETag does not match the book")
+        return BookRead.model_validate_json(body).version
+
+    @staticmethod
+    async def get_list_etag(db: AsyncSession, **filters) -> str:
+        """
+        Return the ETag of the list_books page selected by `filters`, from a
+        keyset query of its rows' id and updated_at only, so conditional
+        requests are answered without loading or serializing books.
+
+        The ETag covers the page's row set (deletes and inserts included), each
+        row's updated_at and whether a next page exists. updated_at has
+        microsecond resolution on PostgreSQL but whole seconds on SQLite, where
+        two writes to a book within one second may share an ETag.
+        """
+        rows, next_id = await BookService.list_books(db, columns=(Book.id, Book.updated_at), **filters)
+        digest = hashlib.sha1(repr(sorted(filters.items())).encode())
+        for book_id, updated_at in rows:
+            digest.update(f"{book_id}@{updated_at.isoformat()};".encode())
+        digest.update(f"next={next_id}".encode())
+        return digest.hexdigest()
+
     @staticmethod
-    def list_books(db: Session) -> List[BookRead]:
-        return db.query(Book).all()
+    async def invalidate_cached(book_id: int) -> None:
+        """Drop a book from the read cache after it changed, see get_book_cached."""
+        await book_cache.set(str(book_id), b"", ttl=BookService.CACHE_LEASE_SECONDS)
 
     @staticmethod
-    def create_book(db: Session, book_in: BookCreate) -> BookRead:
-        book = Book(**book_in.dict(exclude_none=True))
-        db.add(book)
-        db.commit()
-        db.refresh(book)
+    def invalidate_after_commit(db: AsyncSession, book_ids) -> None:
+        """Drop books from the read cache once the session's writes are committed."""
+        book_ids = list(book_ids)
+
+        async def invalidate() -> None:
+            for book_id in book_ids:
+                await BookService.invalidate_cached(book_id)
+        after_commit(db, invalidate)
+
+    @staticmethod
+    async def create_book(db: AsyncSession, book_in: BookCreate) -> BookRead:
+        book = await db.scalar(
+            insert(Book).values(**book_in.model_dump(exclude_none=True)).returning(Book)
+        )
+        BookService.invalidate_after_commit(db, [book.id])
+        await commit(db)
         return book
 
     @staticmethod
-    def update_book(db: Session, book_id: int, book_in: BookUpdate) -> BookRead:
-        book = get_by_id_or_404(db, Book, book_id)
-        for field, value in book_in.dict(exclude_unset=True).items():
-            setattr(book, field, value)
-        db.commit()
-        db.refresh(book)
+    async def update_book(
+        db: AsyncSession, book_id: int, book_in: BookUpdate, version: Optional[int] = None
+    ) -> BookRead:
+        """
+        Change the fields set in `book_in` with one UPDATE ... RETURNING; with
+        `version`, only if the book is still at that version (412 otherwise).
+        """
+        data = book_in.model_dump(exclude_unset=True)
+        if data.get("copies") is not None:
+            # Changing the available copies changes the holdings by as much;
+            # computed in SQL (from the values before the UPDATE) so loans made meanwhile are not lost
+            data["total_copies"] = Book.total_copies + (data["copies"] - Book.copies)
+        book = await update_by_id_or_404(db, Book, book_id, data, version)
+        BookService.invalidate_after_commit(db, [book_id])
+        await commit(db)
         return book
 
     @staticmethod
-    def delete_book(db: Session, book_id: int) -> None:
-        book = get_by_id_or_404(db, Book, book_id)
-        db.delete(book)
-        db.commit()
+    async def delete_book(db: AsyncSession, book_id: int) -> None:
+        if not await BookService.delete_books(db, [book_id]):
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"Book with id={book_id} not found")
+
+    @staticmethod
+    async def delete_books(db: AsyncSession, book_ids: Sequence[int]) -> List[int]:
+        """
+        Delete books with a fixed number of set-based statements, however many
+        books or loans there are: their loans go with them through ON DELETE
+        CASCADE, while their daily stats stay. Returns the ids of the books
+        that existed.
+        """
+        # Lock the books before the readers, like checkouts do
+        deleted = (await db.scalars(
+            select(Book.id).where(Book.id.in_(list(book_ids))).order_by(Book.id).with_for_update()
+        )).all()
+        if not deleted:
+            return []
+        # The books' active loans go with them, so free those readers' loan slots
+        active = (Loan.book_id.in_(deleted), Loan.return_date.is_(None))
+        await db.execute(
+            update(Reader)
+            .where(Reader.id.in_(select(Loan.reader_id).where(*active)))
+            .values(active_loans=Reader.active_loans - (
+                select(func.count(Loan.id)).where(Loan.reader_id == Reader.id, *active).scalar_subquery()
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(Book).where(Book.id.in_(deleted)).execution_options(synchronize_session=False)
+        )
+        BookService.invalidate_after_commit(db, deleted)
+        await commit(db)
+        return deleted
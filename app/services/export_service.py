@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.book import Book
+from app.models.reader import Reader
+from app.models.loan import Loan
+
+
+class ExportEntity(str, Enum):
+    books = "books"
+    readers = "readers"
+    loans = "loans"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+EXPORT_COLUMNS = {
+    ExportEntity.books: (
+        Book.id, Book.title, Book.author, Book.published_year,
+        Book.isbn, Book.copies, Book.total_copies, Book.description,
+        Book.version, Book.created_at, Book.updated_at,
+    ),
+    ExportEntity.readers: (
+        Reader.id, Reader.name, Reader.email, Reader.phone, Reader.version,
+        Reader.created_at, Reader.updated_at,
+    ),
+    ExportEntity.loans: (
+        Loan.id, Loan.book_id, Loan.reader_id, Loan.loan_date,
+        Loan.due_date, Loan.return_date, Loan.created_at, Loan.updated_at,
+    ),
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ExportService:
+    """
+    Streams whole tables as NDJSON or CSV straight from row tuples.
+    """
+    CHUNK_SIZE = 1000
+
+    @staticmethod
+    async def stream(db: AsyncSession, entity: ExportEntity, fmt: ExportFormat) -> AsyncIterator[bytes]:
+        """
+        Yield the table encoded in chunks of CHUNK_SIZE rows.
+
+        Rows are fetched through a server-side cursor (yield_per), so memory use
+        does not depend on the size of the table.
+        """
+        columns = EXPORT_COLUMNS[entity]
+        keys = [column.key for column in columns]
+        stmt = (
+            select(*columns)
+            .order_by(columns[0])
+            .execution_options(yield_per=ExportService.CHUNK_SIZE)
+        )
+        result = await db.stream(stmt)
+        if fmt == ExportFormat.csv:
+            yield ExportService._csv_chunk([keys])
+            async for rows in result.partitions():
+                yield ExportService._csv_chunk(rows)
+        else:
+            async for rows in result.partitions():
+                yield ExportService._ndjson_chunk(keys, rows)
+
+    @staticmethod
+    def _ndjson_chunk(keys: Sequence[str], rows) -> bytes:
+        lines = (
+            json.dumps(dict(zip(keys, row)), default=_json_default, ensure_ascii=False)
+            for row in rows
+        )
+        return ("\n".join(lines) + "\n").encode()
+
+    @staticmethod
+    def _csv_chunk(rows) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(
+            [value.isoformat() if isinstance(value, (datetime, date)) else value for value in row]
+            for row in rows
+        )
+        return buffer.getvalue().encode()
@@ -0,0 +1,196 @@
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import book_cache
+from app.db import after_commit, checkpoint
+from app.models.book import Book
+from app.schemas.book import BookCreate, ImportResult, ImportRowError
+from app.services.export_service import ExportFormat
+
+IMPORT_COLUMNS = ("title", "author", "published_year", "isbn", "copies", "description")
+
+# PostgreSQL: each chunk is COPYed into this staging table, then upserted into books
+_STAGING_DDL = (
+    "CREATE TEMP TABLE IF NOT EXISTS books_import ("
+    "title varchar(255), author varchar(255), published_year integer, "
+    "isbn varchar(20), copies integer, description text"
+    ") ON COMMIT DELETE ROWS"
+)
+# `copies` of an imported row is the available count, like in the API; holdings
+# of an existing book move with it so copies on loan stay accounted for
+_STAGING_UPSERT = (
+    "INSERT INTO books (title, author, published_year, isbn, copies, total_copies, description) "
+    "SELECT title, author, published_year, isbn, copies, copies, description FROM books_import "
+    "ON CONFLICT (isbn) DO UPDATE SET "
+    "title = excluded.title, author = excluded.author, published_year = excluded.published_year, "
+    "copies = excluded.copies, total_copies = excluded.copies + books.total_copies - books.copies, "
+    "description = excluded.description, version = books.version + 1, updated_at = now()"
+)
+
+
+class ImportService:
+    """
+    Loads books from an NDJSON or CSV stream (the formats /export produces).
+
+    Rows are validated against BookCreate in chunks of CHUNK_SIZE and each
+    valid chunk is written in one go and committed: via COPY into a staging
+    table on PostgreSQL, via a multi-row INSERT elsewhere. Rows with an ISBN
+    already in the catalog update that book instead of failing the chunk.
+
+    The import is not atomic: if writing a chunk fails, that chunk is rolled
+    back, the import stops and `aborted` says why, while the chunks before it
+    stay committed (counted in `imported`).
+    """
+    CHUNK_SIZE = 5000
+    # Cap on per-row errors echoed back; `failed` still counts all of them
+    MAX_REPORTED_ERRORS = 100
+
+    @staticmethod
+    async def import_books(db: AsyncSession, body: AsyncIterator[bytes], fmt: ExportFormat) -> ImportResult:
+        result = ImportResult()
+        records = ImportService._csv_records(body) if fmt == ExportFormat.csv else ImportService._ndjson_records(body)
+        chunk: List[Tuple[int, Optional[dict]]] = []
+        async for line, record in records:
+            chunk.append((line, record))
+            if len(chunk) >= ImportService.CHUNK_SIZE:
+                await ImportService._load_chunk(db, chunk, result)
+                if result.aborted:
+                    return result
+                chunk = []
+        if chunk:
+            await ImportService._load_chunk(db, chunk, result)
+        return result
+
+    @staticmethod
+    async def _load_chunk(db: AsyncSession, chunk: List[Tuple[int, Optional[dict]]], result: ImportResult) -> None:
+        # Within a chunk the last row of an ISBN wins, as a sequence of upserts would
+        rows: Dict[object, dict] = {}
+        for line, record in chunk:
+            result.rows += 1
+            try:
+                if record is None:
+                    raise ValueError("Malformed row")
+                book = BookCreate.model_validate(record)
+            except (ValidationError, ValueError, TypeError) as exc:
+                ImportService._add_error(result, line, exc)
+                continue
+            rows[book.isbn if book.isbn is not None else ("line", line)] = book.model_dump()
+        if not rows:
+            return
+        values = list(rows.values())
+        try:
+            await ImportService._write_chunk(db, values)
+            # Upserts may have changed any cached book
+            after_commit(db, book_cache.clear)
+            await checkpoint(db)
+        except SQLAlchemyError as exc:
+            await db.rollback()
+            result.failed += len(values)
+            result.aborted = (
+                f"Writing the rows from line {chunk[0][0]} on failed ({type(exc).__name__}); "
+                "rows imported before them are stored"
+            )
+            return
+        result.imported += len(values)
+
+    @staticmethod
+    async def _write_chunk(db: AsyncSession, values: List[dict]) -> None:
+        if db.bind.dialect.name == "postgresql":
+            await ImportService._copy_postgresql(db, values)
+            return
+        books = Book.__table__
+        stmt = sqlite.insert(books)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[books.c.isbn],
+            set_={
+                **{name: stmt.excluded[name] for name in IMPORT_COLUMNS if name != "isbn"},
+                "total_copies": stmt.excluded.copies + books.c.total_copies - books.c.copies,
+                "version": books.c.version + 1,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt, [{**row, "total_copies": row["copies"]} for row in values])
+
+    @staticmethod
+    async def _copy_postgresql(db: AsyncSession, values: List[dict]) -> None:
+        await db.execute(text(_STAGING_DDL))
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            "books_import",
+            records=[tuple(row[name] for name in IMPORT_COLUMNS) for row in values],
+            columns=IMPORT_COLUMNS,
+        )
+        await db.execute(text(_STAGING_UPSERT))
+
+    @staticmethod
+    def _add_error(result: ImportResult, line: int, exc: Exception) -> None:
+        result.failed += 1
+        if len(result.errors) >= ImportService.MAX_REPORTED_ERRORS:
+            return
+        if isinstance(exc, ValidationError):
+            messages = [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in exc.errors()]
+        else:
+            messages = [str(exc)]
+        result.errors.append(ImportRowError(line=line, errors=messages))
+
+    @staticmethod
+    async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """Split a byte stream into decoded lines, newline included."""
+        pending = b""
+        async for data in body:
+            pending += data
+            *complete, pending = pending.split(b"\n")
+            for line in complete:
+                yield line.decode("utf-8", errors="replace") + "\n"
+        if pending:
+            yield pending.decode("utf-8", errors="replace")
+
+    @staticmethod
+    async def _ndjson_records(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict]]]:
+        number = 0
+        async for line in ImportService._lines(body):
+            number += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+    @staticmethod
+    async def _csv_records(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict]]]:
+        """
+        Parse CSV with a header row. A record ends at the first line break that
+        leaves its quotes balanced, so quoted fields may contain newlines.
+        """
+        header: Optional[List[str]] = None
+        record, start, number = "", 0, 0
+        async for line in ImportService._lines(body):
+            number += 1
+            if not record:
+                start = number
+            record += line
+            if record.count('"') % 2:
+                continue
+            fields = next(csv.reader([record]), None)
+            record = ""
+            if not fields:
+                continue
+            if header is None:
+                header = fields
+            elif len(fields) != len(header):
+                yield start, None
+            else:
+                # Empty cells mean "not given", so model defaults apply
+                yield start, {key: value for key, value in zip(header, fields) if value != ""}
+        if record:
+            yield start, None
@@ -1,13 +1,31 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import HTTPException, status
-from typing import Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta, timezone
 
+from app.core.config import settings
+from app.db import commit
 from app.models.book import Book
 from app.models.reader import Reader
 from app.models.loan import Loan
-from app.schemas.loan import LoanCreate, LoanReturn
-from app.utils import get_by_id_or_404, get_by_filter_or_404
+from app.schemas.loan import (
+    LoanBulkCreate, LoanBulkItem, LoanBulkResult, LoanBulkReturn, LoanCreate, LoanRead, LoanReturn,
+    LoanStatus
+)
+from app.services.book_service import BookService
+from app.services.stats_service import StatsService
+from app.utils import get_by_id_or_404
+
+# Books a reader may hold at the same time
+MAX_ACTIVE_LOANS = 3
+
+
+def due_date() -> datetime:
+    """Due date of a loan made now, per the loan period policy."""
+    return datetime.now(timezone.utc) + timedelta(days=settings.LOAN_PERIOD_DAYS)
+
 
 class LoanService:
     """
@@ -15,67 +33,340 @@ class LoanService:
     """
 
     @staticmethod
-    def create_loan(db: Session, loan_in: LoanCreate) -> Loan:
+    async def _lock_reader(db: AsyncSession, reader_id: int) -> int:
+        """
+        Lock the reader row until commit and return the reader's active loans.
+        Rolls back and raises 404 if there is no such reader.
+        """
+        active_loans = await db.scalar(
+            select(Reader.active_loans)
+            .where(Reader.id == reader_id)
+            .with_for_update()
+        )
+        if active_loans is None:
+            await db.rollback()
+            raise HTTPException(
+                status.HTTP_404_NOT_FOUND,
+                detail=f"Reader with id={reader_id} not found"
+            )
+        return active_loans
+
+    @staticmethod
+    async def create_loan(db: AsyncSession, loan_in: LoanCreate) -> Loan:
         """
         Create a new loan for a book and a reader.
+
+        Correct under concurrent checkouts: the copy and the reader's loan slot
+        are both taken by conditional UPDATEs of the counters (which also lock
+        the rows until commit), so neither the copies nor the 3-loan limit can
+        be oversold.
         """
-        book = get_by_id_or_404(db, Book, loan_in.book_id)
-        if book.copies < 1:
+        # Take a copy only if one is left; books are always locked before the reader
+        taken = await db.scalar(
+            update(Book)
+            .where(Book.id == loan_in.book_id, Book.copies > 0)
+            .values(copies=Book.copies - 1)
+            .returning(Book.id)
+        )
+        if taken is None:
+            await db.rollback()
+            await get_by_id_or_404(db, Book, loan_in.book_id)
             raise HTTPException(
                 status.HTTP_400_BAD_REQUEST,
                 detail="No copies available for this book"
             )
-        get_by_id_or_404(db, Reader, loan_in.reader_id)
-
-        # Check the reader's current active loans (not returned)
-        active_loans = db.query(Loan).filter(
-            Loan.reader_id == loan_in.reader_id,
-            Loan.return_date.is_(None)
-        ).count()
-        if active_loans >= 3:
+
+        # Take a loan slot only if the reader is below the limit
+        reserved = await db.scalar(
+            update(Reader)
+            .where(Reader.id == loan_in.reader_id, Reader.active_loans < MAX_ACTIVE_LOANS)
+            .values(active_loans=Reader.active_loans + 1)
+            .returning(Reader.id)
+        )
+        if reserved is None:
+            await db.rollback()
+            await get_by_id_or_404(db, Reader, loan_in.reader_id)
             raise HTTPException(
                 status.HTTP_400_BAD_REQUEST,
-                detail="Reader has already borrowed 3 books"
+                detail=f"Reader has already borrowed {MAX_ACTIVE_LOANS} books"
             )
-        # Register the loan and update book copies
-        book.copies -= 1
-        loan = Loan(
-            book_id=loan_in.book_id,
-            reader_id=loan_in.reader_id
-        )
-        db.add(loan)
-        db.commit()
-        db.refresh(loan)
+
+        # Register the loan
+        loan = (await db.scalars(
+            insert(Loan)
+            .values(book_id=loan_in.book_id, reader_id=loan_in.reader_id, due_date=due_date())
+            .returning(Loan)
+        )).one()
+        await StatsService.record(db, loan.reader_id, [loan.book_id])
+        BookService.invalidate_after_commit(db, [loan.book_id])
+        await commit(db)
         return loan
 
     @staticmethod
-    def return_loan(db: Session, loan_in: LoanReturn) -> Loan:
+    async def return_loan(db: AsyncSession, loan_in: LoanReturn) -> Loan:
         """
         Return a borrowed book.
         """
-        # Find an active loan for this book and reader
-        loan = get_by_filter_or_404(
-            db, Loan,
-            Loan.book_id == loan_in.book_id,
-            Loan.reader_id == loan_in.reader_id,
-            Loan.return_date.is_(None),
-            detail=f"No loans of book with id={loan_in.book_id} by reader {loan_in.reader_id}"
+        # Close an active loan for this book and reader; the repeated
+        # return_date check keeps two concurrent returns from closing it twice
+        active_loan = (
+            select(Loan.id)
+            .where(
+                Loan.book_id == loan_in.book_id,
+                Loan.reader_id == loan_in.reader_id,
+                Loan.return_date.is_(None)
+            )
+            .limit(1)
+            .scalar_subquery()
+        )
+        loan = await db.scalar(
+            update(Loan)
+            .where(Loan.id == active_loan, Loan.return_date.is_(None))
+            .values(return_date=loan_in.return_date or datetime.now(timezone.utc))
+            .returning(Loan)
+        )
+        if loan is None:
+            await db.rollback()
+            raise HTTPException(
+                status.HTTP_404_NOT_FOUND,
+                detail=f"No loans of book with id={loan_in.book_id} by reader {loan_in.reader_id}"
+            )
+        await db.execute(
+            update(Book)
+            .where(Book.id == loan.book_id)
+            .values(copies=Book.copies + 1)
+        )
+        await db.execute(
+            update(Reader)
+            .where(Reader.id == loan.reader_id)
+            .values(active_loans=Reader.active_loans - 1)
         )
-        book = get_by_id_or_404(db, Book, loan.book_id)
-        book.copies += 1
-        loan.return_date = loan_in.return_date or datetime.utcnow()
-        db.commit()
-        db.refresh(loan)
+        await StatsService.record(db, loan.reader_id, [loan.book_id], checkouts=False, at=loan.return_date)
+        BookService.invalidate_after_commit(db, [loan.book_id])
+        await commit(db)
         return loan
 
     @staticmethod
-    def get_loans_by_reader(db: Session, reader_id: int):
+    async def create_loans_bulk(db: AsyncSession, loans_in: LoanBulkCreate) -> LoanBulkResult:
         """
-        Get all current (not returned) loans for a reader.
+        Loan several books to one reader in a single transaction.
+
+        The batch is checked with set-based statements (one UPDATE takes a copy
+        of every available book, one query locks the reader and reads their
+        loan counter), so the number of round trips does not grow with the batch.
+        Books are granted in request order until the loan limit is reached;
+        every book gets its own result.
         """
-        # Raise HTTPException if reader does not exist
-        get_by_id_or_404(db, Loan, reader_id, detail=f"No loans by reader {reader_id}")
-        return db.query(Loan).filter(
-            Loan.reader_id == reader_id,
-            Loan.return_date.is_(None)
-        ).all()
+        book_ids = loans_in.book_ids
+        taken = set((await db.scalars(
+            update(Book)
+            .where(Book.id.in_(book_ids), Book.copies > 0)
+            .values(copies=Book.copies - 1)
+            .returning(Book.id)
+        )).all())
+        capacity = MAX_ACTIVE_LOANS - await LoanService._lock_reader(db, loans_in.reader_id)
+
+        existing = set(book_ids)
+        if len(taken) < len(book_ids):
+            existing = set((await db.scalars(
+                select(Book.id).where(Book.id.in_(book_ids))
+            )).all())
+
+        results: Dict[int, LoanBulkItem] = {}
+        granted: List[int] = []
+        for book_id in book_ids:
+            if book_id not in existing:
+                results[book_id] = LoanBulkItem(
+                    book_id=book_id, status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Book with id={book_id} not found"
+                )
+            elif book_id not in taken:
+                results[book_id] = LoanBulkItem(
+                    book_id=book_id, status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="No copies available for this book"
+                )
+            elif len(granted) >= capacity:
+                results[book_id] = LoanBulkItem(
+                    book_id=book_id, status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Reader has already borrowed {MAX_ACTIVE_LOANS} books"
+                )
+            else:
+                granted.append(book_id)
+
+        # Give back the copies taken beyond the loan limit
+        over_limit = taken.difference(granted)
+        if over_limit:
+            await db.execute(
+                update(Book)
+                .where(Book.id.in_(over_limit))
+                .values(copies=Book.copies + 1)
+            )
+        if granted:
+            due = due_date()
+            await db.execute(
+                update(Reader)
+                .where(Reader.id == loans_in.reader_id)
+                .values(active_loans=Reader.active_loans + len(granted))
+            )
+            loans = (await db.scalars(
+                insert(Loan).returning(Loan),
+                [
+                    {"book_id": book_id, "reader_id": loans_in.reader_id, "due_date": due}
+                    for book_id in granted
+                ]
+            )).all()
+            for loan in loans:
+                results[loan.book_id] = LoanBulkItem(
+                    book_id=loan.book_id, status_code=status.HTTP_201_CREATED,
+                    loan=LoanRead.model_validate(loan)
+                )
+            await StatsService.record(db, loans_in.reader_id, granted)
+        BookService.invalidate_after_commit(db, granted)
+        await commit(db)
+        return LoanBulkResult(results=[results[book_id] for book_id in loans_in.book_ids])
+
+    @staticmethod
+    async def return_loans_bulk(db: AsyncSession, loans_in: LoanBulkReturn) -> LoanBulkResult:
+        """
+        Return several books of one reader in a single transaction.
+
+        One UPDATE closes an active loan of every listed book, then one UPDATE
+        each restores their copies and the reader's loan counter.
+        """
+        book_ids = loans_in.book_ids
+        active_loans = (
+            select(func.min(Loan.id))
+            .where(
+                Loan.reader_id == loans_in.reader_id,
+                Loan.book_id.in_(book_ids),
+                Loan.return_date.is_(None)
+            )
+            .group_by(Loan.book_id)
+        )
+        loans = (await db.scalars(
+            update(Loan)
+            .where(Loan.id.in_(active_loans), Loan.return_date.is_(None))
+            .values(return_date=loans_in.return_date or datetime.now(timezone.utc))
+            .returning(Loan)
+        )).all()
+        returned = [loan.book_id for loan in loans]
+        if returned:
+            await db.execute(
+                update(Book)
+                .where(Book.id.in_(returned))
+                .values(copies=Book.copies + 1)
+            )
+            await db.execute(
+                update(Reader)
+                .where(Reader.id == loans_in.reader_id)
+                .values(active_loans=Reader.active_loans - len(returned))
+            )
+            await StatsService.record(
+                db, loans_in.reader_id, returned, checkouts=False, at=loans[0].return_date
+            )
+        BookService.invalidate_after_commit(db, returned)
+        await commit(db)
+
+        results = {
+            loan.book_id: LoanBulkItem(
+                book_id=loan.book_id, status_code=status.HTTP_200_OK, loan=LoanRead.model_validate(loan)
+            )
+            for loan in loans
+        }
+        return LoanBulkResult(results=[
+            results.get(book_id) or LoanBulkItem(
+                book_id=book_id, status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No loans of book with id={book_id} by reader {loans_in.reader_id}"
+            )
+            for book_id in loans_in.book_ids
+        ])
+
+    @staticmethod
+    async def get_loans_by_reader(db: AsyncSession, reader_id: int, columns: Optional[Sequence] = None):
+        """
+        Get all current (not returned) loans for a reader; with `columns`,
+        as rows of those columns instead of Loan objects.
+        """
+        stmt = select(*columns) if columns else select(Loan)
+        stmt = stmt.where(Loan.reader_id == reader_id, Loan.return_date.is_(None))
+        loans = (await db.execute(stmt)).all() if columns else (await db.scalars(stmt)).all()
+        if not loans:
+            # Raise HTTPException if reader does not exist
+            await get_by_id_or_404(db, Reader, reader_id)
+        return loans
+
+    @staticmethod
+    async def get_loan_history(
+        db: AsyncSession,
+        reader_id: int,
+        limit: int,
+        after: Optional[int] = None,
+        loan_status: LoanStatus = LoanStatus.all,
+        loaned_from: Optional[datetime] = None,
+        loaned_to: Optional[datetime] = None,
+    ) -> Tuple[Reader, List[Loan], bool]:
+        """
+        Return the reader, one keyset page of their loans (newest first) with
+        title and author of each book loaded in the same query, and whether
+        more loans follow.
+        """
+        reader = await get_by_id_or_404(db, Reader, reader_id)
+        stmt = (
+            select(Loan)
+            .where(Loan.reader_id == reader_id)
+            .options(joinedload(Loan.book).load_only(Book.id, Book.title, Book.author))
+        )
+        if after is not None:
+            stmt = stmt.where(Loan.id < after)
+        if loan_status == LoanStatus.active:
+            stmt = stmt.where(Loan.return_date.is_(None))
+        elif loan_status == LoanStatus.returned:
+            stmt = stmt.where(Loan.return_date.is_not(None))
+        if loaned_from is not None:
+            stmt = stmt.where(Loan.loan_date >= loaned_from)
+        if loaned_to is not None:
+            stmt = stmt.where(Loan.loan_date <= loaned_to)
+        # Fetch one extra row to learn whether another page exists
+        loans = (await db.scalars(stmt.order_by(Loan.id.desc()).limit(limit + 1))).all()
+        return reader, loans[:limit], len(loans) > limit
+
+    @staticmethod
+    async def reconcile_counters(db: AsyncSession) -> Tuple[int, int]:
+        """
+        Recompute the availability counters of books and readers from loans,
+        fixing only rows that drifted. Holdings (total_copies) are trusted and
+        only raised if fewer than the copies actually on loan.
+        Returns the number of books and readers corrected.
+
+        Corrected books are dropped from the book cache after the commit. Run
+        from the CLI, that reaches the API workers only through a shared cache
+        (BOOK_CACHE_BACKEND=redis); with the in-process "memory" backend they
+        serve their cached copies until BOOK_CACHE_TTL_SECONDS expires.
+        """
+        book_loans = (
+            select(func.count(Loan.id))
+            .where(Loan.book_id == Book.id, Loan.return_date.is_(None))
+            .scalar_subquery()
+        )
+        total = case((Book.total_copies < book_loans, book_loans), else_=Book.total_copies)
+        book_ids = (await db.scalars(
+            update(Book)
+            .where(Book.total_copies - Book.copies != book_loans)
+            .values(total_copies=total, copies=total - book_loans)
+            .returning(Book.id)
+            .execution_options(synchronize_session=False)
+        )).all()
+        reader_loans = (
+            select(func.count(Loan.id))
+            .where(Loan.reader_id == Reader.id, Loan.return_date.is_(None))
+            .scalar_subquery()
+        )
+        readers = await db.execute(
+            update(Reader)
+            .where(Reader.active_loans != reader_loans)
+            .values(active_loans=reader_loans)
+            .execution_options(synchronize_session=False)
+        )
+        BookService.invalidate_after_commit(db, book_ids)
+        await commit(db)
+        return len(book_ids), readers.rowcount
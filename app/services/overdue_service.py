@@ -0,0 +1,144 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, select, tuple_, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.core.scheduler import PeriodicTask
+from app.db import AsyncSessionLocal, commit
+from app.models.book import Book
+from app.models.job_state import JobState
+from app.models.loan import Loan
+from app.models.overdue_summary import OverdueSummary
+from app.models.reader import Reader
+from app.schemas.loan import OverdueReaderSummary, OverdueReport
+
+OVERDUE_SCAN_JOB = "overdue_scan"
+
+
+class OverdueService:
+    """
+    Overdue loans: live listing, and the per-reader summary kept by a periodic scan.
+    """
+
+    @staticmethod
+    async def list_overdue(
+        db: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> Tuple[List[Loan], bool]:
+        """
+        Return one keyset page of overdue loans, longest overdue first, with
+        book and reader loaded in the same query, and whether more follow.
+        """
+        stmt = (
+            select(Loan)
+            .where(Loan.return_date.is_(None), Loan.due_date < datetime.now(timezone.utc))
+            .options(
+                joinedload(Loan.book).load_only(Book.id, Book.title, Book.author),
+                joinedload(Loan.reader).load_only(Reader.id, Reader.name),
+            )
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(Loan.due_date, Loan.id) > tuple_(*after))
+        # Fetch one extra row to learn whether another page exists
+        loans = (await db.scalars(stmt.order_by(Loan.due_date, Loan.id).limit(limit + 1))).all()
+        return loans[:limit], len(loans) > limit
+
+    @staticmethod
+    async def scan(db: AsyncSession) -> Optional[int]:
+        """
+        Bring overdue_summaries up to date and return the number of summary
+        rows written, or None if another worker is running the scan.
+
+        The first run builds the summary from all active loans. Later runs only
+        recompute readers whose overdue set may have changed: those with a loan
+        that fell due since the last run, and those already in the summary (an
+        overdue loan may have been returned). Both are index lookups, so a run
+        costs the same however long the loan history is. The readers are
+        selected in SQL, never passed as parameters, so their number is not
+        bounded by the driver's bind-parameter limit.
+        """
+        now = datetime.now(timezone.utc)
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        # Workers racing on the first run both insert the job row; one wins
+        await db.execute(
+            dialect.insert(JobState)
+            .values(name=OVERDUE_SCAN_JOB)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        state = await db.scalar(
+            select(JobState)
+            .where(JobState.name == OVERDUE_SCAN_JOB)
+            .with_for_update(skip_locked=True)
+        )
+        if state is None:
+            return None
+
+        overdue = select(Loan.reader_id, func.count(Loan.id), func.min(Loan.due_date)).where(
+            Loan.return_date.is_(None), Loan.due_date <= now
+        )
+        if state.last_run_at is None:
+            await db.execute(delete(OverdueSummary))
+        else:
+            # Drop the readers left with no overdue loan, then recompute the rest
+            # and those with a loan that fell due since the last run
+            await db.execute(
+                delete(OverdueSummary).where(~exists().where(
+                    Loan.reader_id == OverdueSummary.reader_id,
+                    Loan.return_date.is_(None),
+                    Loan.due_date <= now,
+                ))
+            )
+            newly_due = select(Loan.reader_id).where(
+                Loan.return_date.is_(None),
+                Loan.due_date > state.last_run_at,
+                Loan.due_date <= now,
+            )
+            overdue = overdue.where(Loan.reader_id.in_(union(newly_due, select(OverdueSummary.reader_id))))
+        stmt = dialect.insert(OverdueSummary).from_select(
+            ["reader_id", "overdue_loans", "oldest_due_date"],
+            overdue.group_by(Loan.reader_id),
+        )
+        result = await db.execute(stmt.on_conflict_do_update(
+            index_elements=["reader_id"],
+            set_={
+                "overdue_loans": stmt.excluded.overdue_loans,
+                "oldest_due_date": stmt.excluded.oldest_due_date,
+                "updated_at": func.now(),
+            },
+        ))
+        state.last_run_at = now
+        await commit(db)
+        return result.rowcount
+
+    @staticmethod
+    async def run_scan() -> Optional[int]:
+        async with AsyncSessionLocal() as db:
+            return await OverdueService.scan(db)
+
+    @staticmethod
+    async def report(db: AsyncSession, limit: int) -> OverdueReport:
+        """
+        Overdue totals and the readers with most overdue loans, read from the summary.
+        """
+        state = await db.get(JobState, OVERDUE_SCAN_JOB)
+        overdue_loans, readers = (await db.execute(
+            select(func.coalesce(func.sum(OverdueSummary.overdue_loans), 0), func.count(OverdueSummary.reader_id))
+        )).one()
+        items = (await db.scalars(
+            select(OverdueSummary)
+            .order_by(OverdueSummary.overdue_loans.desc(), OverdueSummary.oldest_due_date)
+            .limit(limit)
+        )).all()
+        return OverdueReport(
+            scanned_at=state.last_run_at if state else None,
+            overdue_loans=overdue_loans,
+            readers=readers,
+            items=[OverdueReaderSummary.model_validate(item) for item in items],
+        )
+
+
+overdue_scan = PeriodicTask("overdue-scan", OverdueService.run_scan)
@@ -1,10 +1,15 @@
-from typing import List
+from typing import List, Optional, Sequence
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db import commit
+from app.models.book import Book
+from app.models.loan import Loan
 from app.models.reader import Reader
-from app.schemas.reader import ReaderCreate, ReaderUpdate
-from app.utils import get_by_id_or_404
+from app.schemas.reader import ReaderBatchItem, ReaderBatchResult, ReaderCreate, ReaderRead, ReaderUpdate
+from app.services.book_service import BookService
+from app.utils import update_by_id_or_404
 
 class ReaderService:
     """
@@ -12,33 +17,77 @@ class ReaderService:
     """
 
     @staticmethod
-    def create_reader(db: Session, reader_in: ReaderCreate) -> Reader:
-        if db.query(Reader).filter(Reader.email == reader_in.email).first():
+    async def create_reader(db: AsyncSession, reader_in: ReaderCreate) -> Reader:
+        if await db.scalar(select(Reader.id).where(Reader.email == reader_in.email)):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
-        reader = Reader(**reader_in.dict())
-        db.add(reader)
-        db.commit()
-        db.refresh(reader)
+        reader = await db.scalar(insert(Reader).values(**reader_in.model_dump()).returning(Reader))
+        await commit(db)
         return reader
 
     @staticmethod
-    def list_readers(db: Session) -> List[Reader]:
-        return db.query(Reader).all()
+    async def list_readers(db: AsyncSession, columns: Optional[Sequence] = None) -> List[Reader]:
+        """
+        Get all readers; with `columns`, as rows of those columns instead of Reader objects.
+        """
+        if columns:
+            return (await db.execute(select(*columns))).all()
+        return (await db.scalars(select(Reader))).all()
 
     @staticmethod
-    def update_reader(db: Session, reader_id: int, reader_in: ReaderUpdate) -> Reader:
-        reader = get_by_id_or_404(db, Reader, reader_id)
-        for field, value in reader_in.dict(exclude_unset=True).items():
-            setattr(reader, field, value)
-        db.commit()
-        db.refresh(reader)
+    async def get_readers_batch(db: AsyncSession, reader_ids: Sequence[int]) -> ReaderBatchResult:
+        """
+        Return the given readers with one IN query, in request order; unknown
+        IDs get a 404 item instead of a reader.
+        """
+        readers = {
+            reader.id: reader
+            for reader in (await db.scalars(
+                select(Reader).where(Reader.id.in_(list(dict.fromkeys(reader_ids))))
+            )).all()
+        }
+        return ReaderBatchResult(results=[
+            ReaderBatchItem(
+                id=reader_id, status_code=status.HTTP_200_OK, reader=ReaderRead.model_validate(readers[reader_id])
+            )
+            if reader_id in readers else
+            ReaderBatchItem(
+                id=reader_id, status_code=status.HTTP_404_NOT_FOUND, detail=f"Reader with id={reader_id} not found"
+            )
+            for reader_id in reader_ids
+        ])
+
+    @staticmethod
+    async def update_reader(
+        db: AsyncSession, reader_id: int, reader_in: ReaderUpdate, version: Optional[int] = None
+    ) -> Reader:
+        """
+        Change the fields set in `reader_in` with one UPDATE ... RETURNING; with
+        `version`, only if the reader is still at that version (412 otherwise).
+        """
+        data = reader_in.model_dump(exclude_unset=True)
+        reader = await update_by_id_or_404(db, Reader, reader_id, data, version)
+        await commit(db)
         return reader
 
     @staticmethod
-    def delete_reader(db: Session, reader_id: int) -> None:
-        reader = get_by_id_or_404(db, Reader, reader_id)
-        db.delete(reader)
-        db.commit()
+    async def delete_reader(db: AsyncSession, reader_id: int) -> None:
+        # The reader's active loans go with them (ON DELETE CASCADE), so their
+        # copies are available again
+        active = (Loan.reader_id == reader_id, Loan.return_date.is_(None))
+        book_ids = (await db.scalars(
+            update(Book)
+            .where(Book.id.in_(select(Loan.book_id).where(*active)))
+            .values(copies=Book.copies + (
+                select(func.count(Loan.id)).where(Loan.book_id == Book.id, *active).scalar_subquery()
+            ))
+            .returning(Book.id)
+            .execution_options(synchronize_session=False)
+        )).all()
+        deleted = await db.scalar(delete(Reader).where(Reader.id == reader_id).returning(Reader.id))
+        if deleted is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"Reader with id={reader_id} not found")
+        BookService.invalidate_after_commit(db, book_ids)
+        await commit(db)
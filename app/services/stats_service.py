@@ -0,0 +1,168 @@
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import commit
+from app.models.book import Book
+from app.models.loan import Loan
+from app.models.reader import Reader
+from app.models.stats import DailyBookStats, DailyReaderStats
+from app.schemas.stats import DailyCirculation, TopBook, TopReader
+
+
+class StatsService:
+    """
+    Circulation statistics served from daily rollups.
+
+    Rollup rows are bumped inside the checkout/return transactions, after the
+    book and reader rows are locked, so they are exact and add no contention
+    of their own. `backfill` rebuilds them from the loans table.
+    """
+
+    @staticmethod
+    def _upsert(db: AsyncSession, model, key: str):
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(model.__table__)
+        return stmt.on_conflict_do_update(
+            index_elements=["day", key],
+            set_={
+                "checkouts": model.__table__.c.checkouts + stmt.excluded.checkouts,
+                "returns": model.__table__.c.returns + stmt.excluded.returns,
+            },
+        )
+
+    @staticmethod
+    async def record(
+        db: AsyncSession,
+        reader_id: int,
+        book_ids: Iterable[int],
+        checkouts: bool = True,
+        at: Optional[datetime] = None,
+    ) -> None:
+        """
+        Count checkouts (or returns, with checkouts=False) of the given books by
+        one reader, on the UTC day of `at` (default: now).
+        Runs in the caller's transaction; the caller commits.
+        """
+        books = Counter(book_ids)
+        if not books:
+            return
+        at = at or datetime.now(timezone.utc)
+        day = (at.astimezone(timezone.utc) if at.tzinfo else at).date()
+        field, other = ("checkouts", "returns") if checkouts else ("returns", "checkouts")
+        await db.execute(
+            StatsService._upsert(db, DailyBookStats, "book_id"),
+            [{"day": day, "book_id": book_id, field: count, other: 0} for book_id, count in books.items()],
+        )
+        await db.execute(
+            StatsService._upsert(db, DailyReaderStats, "reader_id"),
+            [{"day": day, "reader_id": reader_id, field: sum(books.values()), other: 0}],
+        )
+
+    @staticmethod
+    def utc_day(dialect_name: str, column):
+        """
+        SQL for the UTC day of a timestamp column, the day `record` counts in.
+        PostgreSQL would take the date of a timestamptz in the session's
+        TimeZone; SQLite stores the timestamps as UTC already.
+        """
+        if dialect_name == "postgresql":
+            column = func.timezone("UTC", column)
+        return func.date(column)
+
+    @staticmethod
+    async def backfill(db: AsyncSession) -> Tuple[int, int]:
+        """
+        Rebuild both rollups from the whole loan history in one transaction.
+        Returns the number of book and reader rollup rows written.
+        The loans of deleted books and readers are gone, so their past rollups
+        are lost on a rebuild.
+        """
+        dialect_name = db.bind.dialect.name
+        events = union_all(
+            select(
+                StatsService.utc_day(dialect_name, Loan.loan_date).label("day"), Loan.book_id, Loan.reader_id,
+                literal(1).label("checkouts"), literal(0).label("returns"),
+            ),
+            select(
+                StatsService.utc_day(dialect_name, Loan.return_date).label("day"), Loan.book_id, Loan.reader_id,
+                literal(0).label("checkouts"), literal(1).label("returns"),
+            ).where(Loan.return_date.is_not(None)),
+        ).subquery()
+        written = []
+        for model, key in ((DailyBookStats, "book_id"), (DailyReaderStats, "reader_id")):
+            await db.execute(delete(model))
+            result = await db.execute(
+                insert(model).from_select(
+                    ["day", key, "checkouts", "returns"],
+                    select(
+                        events.c.day, events.c[key], func.sum(events.c.checkouts), func.sum(events.c.returns)
+                    ).group_by(events.c.day, events.c[key]),
+                )
+            )
+            written.append(result.rowcount)
+        await commit(db)
+        return written[0], written[1]
+
+    @staticmethod
+    def _since(days: int) -> date:
+        return datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+    @staticmethod
+    async def top_books(db: AsyncSession, days: int, limit: int) -> List[TopBook]:
+        """Books checked out most over the last `days` days."""
+        checkouts = func.sum(DailyBookStats.checkouts).label("checkouts")
+        ranked = (
+            select(DailyBookStats.book_id, checkouts)
+            .where(DailyBookStats.day >= StatsService._since(days))
+            .group_by(DailyBookStats.book_id)
+            .order_by(checkouts.desc(), DailyBookStats.book_id)
+            .limit(limit)
+            .subquery()
+        )
+        rows = await db.execute(
+            select(ranked.c.book_id, Book.title, Book.author, ranked.c.checkouts)
+            .join(Book, Book.id == ranked.c.book_id)
+            .where(ranked.c.checkouts > 0)
+            .order_by(ranked.c.checkouts.desc(), ranked.c.book_id)
+        )
+        return [TopBook(**row._mapping) for row in rows]
+
+    @staticmethod
+    async def top_readers(db: AsyncSession, days: int, limit: int) -> List[TopReader]:
+        """Readers with most checkouts over the last `days` days."""
+        checkouts = func.sum(DailyReaderStats.checkouts).label("checkouts")
+        ranked = (
+            select(DailyReaderStats.reader_id, checkouts)
+            .where(DailyReaderStats.day >= StatsService._since(days))
+            .group_by(DailyReaderStats.reader_id)
+            .order_by(checkouts.desc(), DailyReaderStats.reader_id)
+            .limit(limit)
+            .subquery()
+        )
+        rows = await db.execute(
+            select(ranked.c.reader_id, Reader.name, ranked.c.checkouts)
+            .join(Reader, Reader.id == ranked.c.reader_id)
+            .where(ranked.c.checkouts > 0)
+            .order_by(ranked.c.checkouts.desc(), ranked.c.reader_id)
+        )
+        return [TopReader(**row._mapping) for row in rows]
+
+    @staticmethod
+    async def daily(db: AsyncSession, date_from: date, date_to: date) -> List[DailyCirculation]:
+        """Total checkouts and returns per day in the range, days without activity left out."""
+        rows = await db.execute(
+            select(
+                DailyReaderStats.day,
+                func.sum(DailyReaderStats.checkouts).label("checkouts"),
+                func.sum(DailyReaderStats.returns).label("returns"),
+            )
+            .where(DailyReaderStats.day >= date_from, DailyReaderStats.day <= date_to)
+            .group_by(DailyReaderStats.day)
+            .order_by(DailyReaderStats.day)
+        )
+        return [DailyCirculation(**row._mapping) for row in rows]
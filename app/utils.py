@@ -1,8 +1,17 @@
+import base64
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, List, Optional, Sequence
+
+from pydantic import BaseModel
+
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-def get_by_id_or_404(
-    db: Session,
+async def get_by_id_or_404(
+    db: AsyncSession,
     model,
     object_id,
     detail: str = None,
@@ -11,15 +20,47 @@ def get_by_id_or_404(
     """
     Query the DB for an object by primary key and raise HTTPException if not found.
     """
-    obj = db.get(model, object_id)
+    obj = await db.get(model, object_id)
     if not obj:
         if not detail:
             detail = f"{model.__name__} with id={object_id} not found"
         raise HTTPException(status_code, detail=detail)
     return obj
 
-def get_by_filter_or_404(
-    db: Session,
+async def update_by_id_or_404(db: AsyncSession, model, object_id, values: dict, version: Optional[int] = None):
+    """
+    Update an object by primary key with a single UPDATE ... RETURNING, bumping
+    its version column, and return it as stored (generated columns included).
+    With `version`, update only if the object is still at that version
+    (optimistic concurrency). Raises HTTPException 404 if there is no such
+    object and 412 if it is at another version.
+    """
+    if values:
+        stmt = update(model).where(model.id == object_id)
+        if version is not None:
+            stmt = stmt.where(model.version == version)
+        obj = await db.scalar(
+            stmt.values(**values, version=model.version + 1)
+            .returning(model)
+            .execution_options(populate_existing=True)
+        )
+        if obj is not None:
+            return obj
+        if version is None:
+            raise HTTPException(
+                status.HTTP_404_NOT_FOUND, detail=f"{model.__name__} with id={object_id} not found"
+            )
+    # Nothing to update, or nothing updated at this version: missing or stale?
+    obj = await get_by_id_or_404(db, model, object_id)
+    if version is not None and obj.version != version:
+        raise HTTPException(
+            status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"{model.__name__} with id={object_id} was modified: current version is {obj.version}"
+        )
+    return obj
+
+async def get_by_filter_or_404(
+    db: AsyncSession,
     model,
     *filter_conditions,
     detail: str = None,
@@ -31,9 +72,136 @@ def get_by_filter_or_404(
     """
     Query the DB for an object using filter conditions and raise HTTPException if not found.
     """
-    obj = db.query(model).filter(*filter_conditions).first()
+    obj = await db.scalar(select(model).where(*filter_conditions).limit(1))
     if not obj:
         if not detail:
             detail = f"{model.__name__} not found"
         raise HTTPException(status_code, detail=detail)
     return obj
+
+def encode_cursor(position: dict) -> str:
+    """
+    Pack a keyset position into an opaque, URL-safe cursor string.
+    """
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Unpack a cursor produced by encode_cursor and raise HTTPException if it is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        position = None
+    if not isinstance(position, dict):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return position
+
+def render_page(
+    items: Sequence[BaseModel],
+    cursor_for: Callable[[BaseModel], str],
+    has_more: bool,
+    max_bytes: int,
+    **fields: BaseModel
+) -> bytes:
+    """
+    Serialize a keyset page to JSON: `fields`, then "items" and "next_cursor".
+
+    Items are added while the body stays within max_bytes (the first one always
+    is). When the budget cuts the page short, next_cursor points after the last
+    item sent, so clients just continue from there.
+    """
+    head = b"".join(b'"%s":%s,' % (name.encode(), value.model_dump_json().encode()) for name, value in fields.items())
+    # Braces, keys and the cursor itself
+    size = len(head) + 128
+    encoded = []
+    for item in items:
+        chunk = item.model_dump_json().encode()
+        if encoded and size + len(chunk) + 1 > max_bytes:
+            has_more = True
+            break
+        encoded.append(chunk)
+        size += len(chunk) + 1
+    next_cursor = cursor_for(items[len(encoded) - 1]) if has_more and encoded else None
+    return (
+        b"{" + head + b'"items":[' + b",".join(encoded) + b'],"next_cursor":'
+        + json.dumps(next_cursor).encode() + b"}"
+    )
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header value against an entity tag (weak comparison).
+    """
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+def parse_ids(values: Sequence[str], max_ids: int) -> List[int]:
+    """
+    IDs of a query parameter given comma-separated (?ids=1,2,3), repeated
+    (?ids=1&ids=2) or both, in request order. Raises HTTPException 400 if
+    there are none, more than `max_ids` or a value is not an integer.
+    """
+    try:
+        ids = [int(part) for value in values for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="ids must be integers")
+    if not ids:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="No ids given")
+    if len(ids) > max_ids:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=f"At most {max_ids} ids per request")
+    return ids
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """
+    Version an If-Match header requires (`"3"` or `3`), or None if there is no
+    header or it is `*`. Raises HTTPException 412 for a value no version can match.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match must be the version of the object"
+        )
+
+def http_date(value: datetime) -> str:
+    """
+    Format a timestamp for Last-Modified; naive values are taken as UTC.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[str] = None
+) -> bool:
+    """
+    Evaluate conditional GET headers against a representation's validators:
+    If-None-Match when present, otherwise If-Modified-Since (RFC 9110, 13.2.2).
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if not if_modified_since or not last_modified:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        # Invalid dates are ignored, as the RFC asks
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return parsedate_to_datetime(last_modified) <= since
@@ -0,0 +1,114 @@
+"""
+Throughput of the sync (threadpool) vs async (event loop) database request path.
+
+The sync path mimics a `def` FastAPI handler: every request runs in AnyIO's
+worker threads (40 by default) and holds one of them for its whole DB round
+trip. The async path mimics an `async def` handler with an AsyncSession.
+
+    python -m benchmarks.bench_async_db --requests 5000 --concurrency 200
+    python -m benchmarks.bench_async_db --url sqlite:///bench.db
+
+By default the database from DATABASE_URL is used; the books table is
+created and seeded if it is empty. Run it against PostgreSQL: aiosqlite
+itself hops through a thread per call, so SQLite numbers say little.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import anyio
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import Base, to_async_url
+from app.models.book import Book
+from app.models.loan import Loan  # noqa: F401
+from app.models.reader import Reader  # noqa: F401
+
+
+def seed(url: str, count: int) -> list:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine, tables=[Book.__table__])
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        existing = db.scalar(select(func.count(Book.id)))
+        if existing < count:
+            db.add_all(
+                Book(title=f"Bench book {i}", author=f"Author {i % 100}", copies=1)
+                for i in range(existing, count)
+            )
+            db.commit()
+        ids = db.scalars(select(Book.id).limit(count)).all()
+    engine.dispose()
+    return ids
+
+
+def report(name: str, latencies: list, elapsed: float) -> None:
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name:>6}: {len(latencies) / elapsed:8.0f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms"
+    )
+
+
+async def run_sync(url: str, ids: list, requests: int, concurrency: int) -> None:
+    engine = create_engine(url, pool_size=concurrency, max_overflow=0)
+    Session = sessionmaker(bind=engine)
+    latencies = []
+
+    def handler(book_id: int) -> None:
+        with Session() as db:
+            db.get(Book, book_id)
+
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            start = time.perf_counter()
+            await anyio.to_thread.run_sync(handler, random.choice(ids))
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for _ in range(concurrency):
+            tg.start_soon(worker, requests // concurrency)
+    report("sync", latencies, time.perf_counter() - started)
+    engine.dispose()
+
+
+async def run_async(url: str, ids: list, requests: int, concurrency: int) -> None:
+    engine = create_async_engine(to_async_url(url), pool_size=concurrency, max_overflow=0)
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    latencies = []
+
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            start = time.perf_counter()
+            async with Session() as db:
+                await db.get(Book, random.choice(ids))
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    report("async", latencies, time.perf_counter() - started)
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="sync SQLAlchemy URL")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--books", type=int, default=1000)
+    args = parser.parse_args()
+
+    ids = seed(args.url, args.books)
+    asyncio.run(run_sync(args.url, ids, args.requests, args.concurrency))
+    asyncio.run(run_async(args.url, ids, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
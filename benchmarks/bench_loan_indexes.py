@@ -0,0 +1,139 @@
+"""
+Query plans and latency of the active-loan lookups with and without the
+partial indexes on loans (ix_loans_reader_id_active, ix_loans_book_id_reader_id_active).
+
+    python -m benchmarks.bench_loan_indexes --loans 1000000
+    python -m benchmarks.bench_loan_indexes --url sqlite:///bench.db
+
+The loans table is seeded with a long returned history and a small share of
+active loans, as in production. Each query is shown with its plan (EXPLAIN on
+PostgreSQL, EXPLAIN QUERY PLAN on SQLite) and mean latency, first with the
+partial indexes dropped, then with them created.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import Base
+from app.models.book import Book
+from app.models.loan import Loan
+from app.models.reader import Reader
+
+ACTIVE_LOAN_INDEXES = ("ix_loans_reader_id_active", "ix_loans_book_id_reader_id_active")
+BATCH = 10000
+
+
+def seed(engine, books: int, readers: int, loans: int, active_share: float) -> None:
+    Base.metadata.create_all(engine, tables=[Book.__table__, Reader.__table__, Loan.__table__])
+    with Session(engine) as db:
+        if db.scalar(select(func.count(Loan.id))) >= loans:
+            return
+        db.execute(insert(Book), [
+            {"title": f"Bench book {i}", "author": f"Author {i % 100}", "copies": 1000, "total_copies": 1000}
+            for i in range(books)
+        ])
+        db.execute(insert(Reader), [
+            {"name": f"Reader {i}", "email": f"bench_{i}@example.com", "phone": "0"}
+            for i in range(readers)
+        ])
+        book_ids = db.scalars(select(Book.id)).all()
+        reader_ids = db.scalars(select(Reader.id)).all()
+        start = datetime(2020, 1, 1)
+        for offset in range(0, loans, BATCH):
+            rows = []
+            for _ in range(min(BATCH, loans - offset)):
+                loan_date = start + timedelta(minutes=random.randrange(2_000_000))
+                returned = random.random() >= active_share
+                rows.append({
+                    "book_id": random.choice(book_ids),
+                    "reader_id": random.choice(reader_ids),
+                    "loan_date": loan_date,
+                    "due_date": loan_date + timedelta(days=14),
+                    "return_date": loan_date + timedelta(days=14) if returned else None,
+                })
+            db.execute(insert(Loan), rows)
+            db.commit()
+        db.execute(text("ANALYZE"))
+        db.commit()
+
+
+def queries(db: Session) -> dict:
+    # The newest active loan, so a sequential scan can't stop early
+    active = db.execute(
+        select(Loan.book_id, Loan.reader_id)
+        .where(Loan.return_date.is_(None))
+        .order_by(Loan.id.desc())
+        .limit(1)
+    ).first()
+    book_id, reader_id = active if active else (1, 1)
+    return {
+        "active loans of a reader": (
+            select(Loan).where(Loan.reader_id == reader_id, Loan.return_date.is_(None))
+        ),
+        "active loan of a book by a reader": (
+            select(Loan.id)
+            .where(Loan.book_id == book_id, Loan.reader_id == reader_id, Loan.return_date.is_(None))
+            .limit(1)
+        ),
+    }
+
+
+def explain(db: Session, stmt) -> str:
+    sql = str(stmt.compile(db.bind, compile_kwargs={"literal_binds": True}))
+    if db.bind.dialect.name == "sqlite":
+        rows = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return "\n".join(f"    {row[-1]}" for row in rows)
+    rows = db.execute(text(f"EXPLAIN ANALYZE {sql}")).scalars().all()
+    return "\n".join(f"    {row}" for row in rows)
+
+
+def measure(db: Session, stmt, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.execute(stmt).all()
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings)
+
+
+def run(engine, label: str, repeat: int) -> None:
+    print(f"== {label}")
+    with Session(engine) as db:
+        for name, stmt in queries(db).items():
+            print(f"  {name}: {measure(db, stmt, repeat) * 1000:.3f} ms")
+            print(explain(db, stmt))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="sync SQLAlchemy URL")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--readers", type=int, default=50000)
+    parser.add_argument("--loans", type=int, default=1000000)
+    parser.add_argument("--active-share", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    seed(engine, args.books, args.readers, args.loans, args.active_share)
+    indexes = [index for index in Loan.__table__.indexes if index.name in ACTIVE_LOAN_INDEXES]
+
+    for index in indexes:
+        index.drop(engine, checkfirst=True)
+    run(engine, "without partial indexes", args.repeat)
+    for index in indexes:
+        index.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    run(engine, "with partial indexes", args.repeat)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Request throughput of validation- and serialization-heavy endpoints, measured
+in-process through the ASGI app (no network, no server), e.g. to compare
+pydantic versions:
+
+    python -m benchmarks.bench_requests --requests 200
+    python -m benchmarks.bench_requests --url sqlite:///bench.db
+
+Covered: a 500-book page, the full reader list, 500 items of loan history
+(nested models) and a bulk checkout/return round trip of 50 books (request
+validation and per-item results; a round trip counts as one request). The
+regular serialization path is used (FAST_LIST_SERIALIZATION off). By default
+the database from DATABASE_URL is used; the tables are created and seeded if
+the benchmark reader is missing.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import Base, get_db, to_async_url, unit_of_work
+from app.main import app
+from app.models.book import Book
+from app.models.loan import Loan
+from app.models.reader import Reader
+from app.services.loan_service import due_date
+
+BENCH_EMAIL = "bench_reader@example.com"
+
+
+def seed(url: str, books: int, readers: int, history: int) -> tuple:
+    """Return (reader id with `history` returned loans, ids of 50 books to borrow)."""
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        reader_id = db.scalar(select(Reader.id).where(Reader.email == BENCH_EMAIL))
+        if reader_id is None:
+            db.execute(insert(Book), [
+                {"title": f"Bench book {i}", "author": f"Author {i % 100}", "published_year": 1900 + i % 120,
+                 "isbn": f"bench-{i}", "copies": 5, "total_copies": 5, "description": "A book " * 20}
+                for i in range(books)
+            ])
+            db.execute(insert(Reader), [
+                {"name": f"Reader {i}", "email": f"bench_{i}@example.com", "phone": "9513219876"}
+                for i in range(readers)
+            ])
+            reader_id = db.scalar(
+                insert(Reader).values(name="Bench", email=BENCH_EMAIL, phone="9513219876").returning(Reader.id)
+            )
+            book_ids = db.scalars(select(Book.id).order_by(Book.id).limit(history)).all()
+            loan_date = due_date()
+            db.execute(insert(Loan), [
+                {"book_id": book_id, "reader_id": reader_id, "loan_date": loan_date,
+                 "due_date": loan_date, "return_date": loan_date}
+                for book_id in book_ids
+            ])
+            db.commit()
+        book_ids = db.scalars(select(Book.id).order_by(Book.id.desc()).limit(50)).all()
+    engine.dispose()
+    return reader_id, book_ids
+
+
+async def run(url: str, reader_id: int, book_ids: list, requests: int) -> None:
+    engine = create_async_engine(to_async_url(url))
+    Session = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def _get_db():
+        async with unit_of_work(Session) as db:
+            yield db
+
+    app.dependency_overrides[get_db] = _get_db
+    settings.FAST_LIST_SERIALIZATION = False
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        credentials = {"email": f"bench_{uuid.uuid4().hex}@example.com", "password": "secret123"}
+        await client.post("/auth/register", json=credentials)
+        token = (await client.post("/auth/login", json=credentials)).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        async def bulk_round_trip() -> None:
+            body = {"reader_id": reader_id, "book_ids": book_ids}
+            (await client.post("/loans/bulk", json=body)).raise_for_status()
+            (await client.post("/loans/return/bulk", json=body)).raise_for_status()
+
+        scenarios = {
+            "GET /books/?limit=500": lambda: client.get("/books/", params={"limit": 500}),
+            "GET /readers/": lambda: client.get("/readers/"),
+            "GET /loans/{id}/history?limit=500": lambda: client.get(
+                f"/loans/{reader_id}/history", params={"limit": 500}
+            ),
+            "POST /loans/bulk + /return/bulk": bulk_round_trip,
+        }
+        for name, call in scenarios.items():
+            await call()
+            start = time.perf_counter()
+            for _ in range(requests):
+                response = await call()
+                if response is not None:
+                    response.raise_for_status()
+            elapsed = time.perf_counter() - start
+            print(f"{name:>36}: {requests / elapsed:8.1f} req/s  {elapsed / requests * 1000:7.2f} ms/req")
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="sync SQLAlchemy URL")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    reader_id, book_ids = seed(args.url, args.books, args.readers, args.history)
+    asyncio.run(run(args.url, reader_id, book_ids, args.requests))
+
+
+if __name__ == "__main__":
+    main()
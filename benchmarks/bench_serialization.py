@@ -0,0 +1,116 @@
+"""
+Cost of a large list response on the regular path vs the fast path
+(settings.FAST_LIST_SERIALIZATION).
+
+Regular path: ORM objects are loaded, validated into the response model and
+passed through jsonable_encoder and JSONResponse, as FastAPI does for a
+`response_model`. Fast path: only the response model's columns are selected
+as rows and ORJSONResponse encodes them directly.
+
+    python -m benchmarks.bench_serialization --rows 10000
+    python -m benchmarks.bench_serialization --url sqlite:///bench.db
+
+By default the database from DATABASE_URL is used; the books and readers
+tables are created and seeded if they hold fewer than --rows rows.
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.serialization import ORJSONResponse, columns_for
+from app.db import Base
+from app.models.book import Book
+from app.models.loan import Loan  # noqa: F401
+from app.models.reader import Reader
+from app.schemas.book import BookPage, BookRead
+from app.schemas.reader import ReaderRead
+
+
+def seed(engine, rows: int) -> None:
+    Base.metadata.create_all(engine, tables=[Book.__table__, Reader.__table__])
+    with Session(engine) as db:
+        books = db.scalar(select(func.count(Book.id)))
+        if books < rows:
+            db.execute(insert(Book), [
+                {
+                    "title": f"Bench book {i}", "author": f"Author {i % 100}", "published_year": 1900 + i % 120,
+                    "isbn": f"bench-{i}", "copies": 3, "total_copies": 3, "description": "A book " * 20,
+                }
+                for i in range(books, rows)
+            ])
+        readers = db.scalar(select(func.count(Reader.id)))
+        if readers < rows:
+            db.execute(insert(Reader), [
+                {"name": f"Reader {i}", "email": f"bench_{i}@example.com", "phone": "9513219876"}
+                for i in range(readers, rows)
+            ])
+        db.commit()
+
+
+def regular_books(db: Session, rows: int) -> bytes:
+    books = db.scalars(select(Book).order_by(Book.id).limit(rows)).all()
+    page = BookPage.model_validate({"items": books, "next_cursor": None})
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def fast_books(db: Session, rows: int) -> bytes:
+    books = db.execute(select(*columns_for(Book, BookRead)).order_by(Book.id).limit(rows)).all()
+    return ORJSONResponse({"items": books, "next_cursor": None}).body
+
+
+def regular_readers(db: Session, rows: int) -> bytes:
+    readers = db.scalars(select(Reader).order_by(Reader.id).limit(rows)).all()
+    return JSONResponse(jsonable_encoder(TypeAdapter(List[ReaderRead]).validate_python(readers))).body
+
+
+def fast_readers(db: Session, rows: int) -> bytes:
+    readers = db.execute(select(*columns_for(Reader, ReaderRead)).order_by(Reader.id).limit(rows)).all()
+    return ORJSONResponse(readers).body
+
+
+def measure(engine, fn, rows: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        # A fresh session per run, so ORM objects aren't served from the identity map
+        with Session(engine) as db:
+            start = time.perf_counter()
+            fn(db, rows)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="sync SQLAlchemy URL")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    seed(engine, args.rows)
+    for name, regular, fast in (
+        ("books", regular_books, fast_books),
+        ("readers", regular_readers, fast_readers),
+    ):
+        with Session(engine) as db:
+            if regular(db, args.rows) != fast(db, args.rows):
+                raise SystemExit(f"{name}: fast path output differs from the regular path")
+        slow_time = measure(engine, regular, args.rows, args.repeat)
+        fast_time = measure(engine, fast, args.rows, args.repeat)
+        print(
+            f"{name:>8} x{args.rows}: regular {slow_time * 1000:8.2f} ms  "
+            f"fast {fast_time * 1000:8.2f} ms  ({slow_time / fast_time:.1f}x)"
+        )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
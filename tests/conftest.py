@@ -1,41 +1,59 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 import uuid
 
-from app.db import Base, get_db
+from app.core.cache import book_cache
+from app.core.config import settings
+from app.core.instrumentation import instrument_engine
+from app.core.revocation import revocation_list
+from app.core.security import principal_cache
+from app.db import Base, enforce_foreign_keys, get_db, unit_of_work
 from app.main import app
 
 # Config for test DB (in-memory, isolation via StaticPool)
-TEST_DB_URL = "sqlite:///:memory:"
-engine = create_engine(
+TEST_DB_URL = "sqlite+aiosqlite:///:memory:"
+engine = create_async_engine(
     TEST_DB_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool
 )
-TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+instrument_engine(engine.sync_engine)
+enforce_foreign_keys(engine.sync_engine)
+
+# The scheduler would scan the real database; tests call OverdueService.scan directly
+settings.OVERDUE_SCAN_INTERVAL_SECONDS = 0
+
+async def _run_ddl(fn):
+    async with engine.begin() as conn:
+        await conn.run_sync(fn)
 
 @pytest.fixture(autouse=True)
 def prepare_database():
     """Full isolation: recreate tables before each test."""
-    Base.metadata.create_all(bind=engine)
+    asyncio.run(_run_ddl(Base.metadata.create_all))
+    asyncio.run(book_cache.clear())
+    principal_cache.clear()
+    revocation_list.reset()
     yield
-    Base.metadata.drop_all(bind=engine)
+    asyncio.run(_run_ddl(Base.metadata.drop_all))
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
 
 @pytest.fixture
 def client():
     """TestClient with a separate test database."""
-    def _get_test_db():
-        db = TestingSessionLocal()
-        try:
+    async def _get_test_db():
+        async with unit_of_work(TestingSessionLocal) as db:
             yield db
-        finally:
-            db.close()
     app.dependency_overrides[get_db] = _get_test_db
-    test_client = TestClient(app)
-    yield test_client
+    with TestClient(app) as test_client:
+        yield test_client
     app.dependency_overrides.clear()
 
 @pytest.fixture
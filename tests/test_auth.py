@@ -1,4 +1,5 @@
 from fastapi import status
+from sqlalchemy import select
 import pytest
 
 def test_register_login_logout_and_me(client, make_auth_header):
@@ -18,3 +19,102 @@ def test_register_login_logout_and_me(client, make_auth_header):
     # After logout, /me is forbidden again
     resp = client.get("/auth/me", headers=auth_header)
     assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.anyio
+async def test_deactivated_user_loses_access(client, make_auth_header):
+    from app.models.user import User
+    from tests.conftest import TestingSessionLocal
+
+    auth_header = make_auth_header(email="inactive@example.com")
+    resp = client.get("/auth/me", headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["email"] == "inactive@example.com"
+
+    # The principal is cached now; deactivation must still take effect
+    async with TestingSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.email == "inactive@example.com"))
+        user.is_active = False
+        await db.commit()
+
+    resp = client.get("/auth/me", headers=auth_header)
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.anyio
+async def test_login_rehashes_outdated_password_hash(client):
+    from passlib.context import CryptContext
+    from app.core.security import pwd_context
+    from app.models.user import User
+    from tests.conftest import TestingSessionLocal
+
+    weak_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret123")
+    async with TestingSessionLocal() as db:
+        db.add(User(email="legacy@example.com", hashed_password=weak_hash))
+        await db.commit()
+
+    resp = client.post("/auth/login", json={"email": "legacy@example.com", "password": "secret123"})
+    assert resp.status_code == status.HTTP_200_OK
+
+    async with TestingSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.email == "legacy@example.com"))
+    assert user.hashed_password != weak_hash
+    assert not pwd_context.needs_update(user.hashed_password)
+
+
+@pytest.mark.anyio
+async def test_password_hasher_rejects_when_queue_is_full():
+    from fastapi import HTTPException
+    from app.core.security import PasswordHasher
+
+    hasher = PasswordHasher(workers=0, queue_limit=1, retry_after=3)
+    assert await hasher.run(lambda: "done") == "done"
+
+    # Occupy the only slot, as a long-running hash would
+    hasher._slots.acquire()
+    with pytest.raises(HTTPException) as exc_info:
+        await hasher.run(lambda: "rejected")
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert exc_info.value.headers["Retry-After"] == "3"
+
+@pytest.mark.anyio
+async def test_deactivation_in_another_worker_reaches_cached_principals(client, make_auth_header):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import update
+    from app.core.revocation import revocation_list
+    from app.core.security import user_marker
+    from app.models.user import User
+    from app.services.auth_service import AuthService
+    from tests.conftest import TestingSessionLocal
+
+    auth_header = make_auth_header(email="elsewhere@example.com")
+    assert client.get("/auth/me", headers=auth_header).status_code == status.HTTP_200_OK
+
+    # Another worker deactivates the user with a Core UPDATE (no ORM event
+    # here) and publishes the marker to the shared store only
+    async with TestingSessionLocal() as db:
+        user_id = await db.scalar(
+            update(User).where(User.email == "elsewhere@example.com").values(is_active=False).returning(User.id)
+        )
+        await db.commit()
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=1)
+        await revocation_list.store.revoke(db, user_marker(user_id), expires_at)
+    revocation_list.reset()  # as if REVOCATION_SYNC_SECONDS had passed
+    assert client.get("/auth/me", headers=auth_header).status_code == status.HTTP_401_UNAUTHORIZED
+
+    async with TestingSessionLocal() as db:
+        assert await AuthService.set_user_active(db, "elsewhere@example.com", True) is not None
+        assert await AuthService.set_user_active(db, "nobody@example.com", True) is None
+    assert client.get("/auth/me", headers=auth_header).status_code == status.HTTP_200_OK
+    async with TestingSessionLocal() as db:
+        await AuthService.set_user_active(db, "elsewhere@example.com", False)
+    assert client.get("/auth/me", headers=auth_header).status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_token_without_expiry(client, make_auth_header):
+    from jose import jwt
+    from app.core.config import settings
+
+    make_auth_header(email="noexp@example.com")
+    token = jwt.encode({"sub": "noexp@example.com", "jti": "no-exp"}, settings.SECRET_KEY, algorithm="HS256")
+    auth_header = {"Authorization": f"Bearer {token}"}
+    assert client.get("/auth/me", headers=auth_header).status_code == status.HTTP_200_OK
+    assert client.post("/auth/logout", headers=auth_header).status_code == status.HTTP_204_NO_CONTENT
+    assert client.get("/auth/me", headers=auth_header).status_code == status.HTTP_401_UNAUTHORIZED
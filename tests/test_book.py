@@ -1,5 +1,17 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
 from fastapi import status
 import pytest
+from sqlalchemy import update
+
+from app.core.cache import book_cache
+from app.core.config import settings
+from app.db import unit_of_work
+from app.models.book import Book
+from app.schemas.book import BookCreate, BookUpdate
+from app.services.book_service import BookService
+from tests.conftest import TestingSessionLocal
 
 @pytest.fixture
 def book_payload():
@@ -42,3 +54,303 @@ def test_crud_books(client, make_auth_header, book_payload):
     # Not found afterwards
     resp = client.get(f"/books/{book_id}")
     assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+def test_list_books_keyset_pagination(client, make_auth_header):
+    auth_header = make_auth_header()
+    for i in range(5):
+        resp = client.post(
+            "/books/",
+            json={"title": f"Book {i}", "author": "Bob" if i % 2 else "Alice", "published_year": 2000 + i},
+            headers=auth_header
+        )
+        assert resp.status_code == status.HTTP_201_CREATED
+
+    # Walk the whole catalog two books at a time
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["after"] = cursor
+        resp = client.get("/books/", params=params)
+        assert resp.status_code == status.HTTP_200_OK
+        page = resp.json()
+        assert len(page["items"]) <= 2
+        seen.extend(book["title"] for book in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"Book {i}" for i in range(5)]
+
+    # Filters
+    resp = client.get("/books/", params={"author": "Bob"})
+    assert [b["title"] for b in resp.json()["items"]] == ["Book 1", "Book 3"]
+    resp = client.get("/books/", params={"published_year_from": 2002, "published_year_to": 2003})
+    assert [b["title"] for b in resp.json()["items"]] == ["Book 2", "Book 3"]
+
+    # Malformed cursor
+    resp = client.get("/books/", params={"after": "not-a-cursor"})
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_search_books(client, make_auth_header):
+    auth_header = make_auth_header()
+    books = [
+        {"title": "War and Peace", "author": "Leo Tolstoy", "description": "Napoleonic wars"},
+        {"title": "Anna Karenina", "author": "Leo Tolstoy", "description": "A novel about love"},
+        {"title": "The Art of War", "author": "Sun Tzu", "description": None},
+    ]
+    for book in books:
+        resp = client.post("/books/", json=book, headers=auth_header)
+        assert resp.status_code == status.HTTP_201_CREATED
+
+    resp = client.get("/books/search", params={"q": "war"})
+    assert resp.status_code == status.HTTP_200_OK
+    titles = [b["title"] for b in resp.json()["items"]]
+    assert set(titles) == {"War and Peace", "The Art of War"}
+
+    resp = client.get("/books/search", params={"q": "tolstoy", "limit": 1})
+    page = resp.json()
+    assert len(page["items"]) == 1
+    resp = client.get("/books/search", params={"q": "tolstoy", "limit": 1, "after": page["next_cursor"]})
+    second = resp.json()
+    assert len(second["items"]) == 1 and second["next_cursor"] is None
+    assert second["items"][0]["id"] != page["items"][0]["id"]
+
+    # Index follows updates and deletes; query syntax characters are harmless
+    book_id = page["items"][0]["id"]
+    client.put(f"/books/{book_id}", json={"author": "Anonymous"}, headers=auth_header)
+    client.delete(f"/books/{second['items'][0]['id']}", headers=auth_header)
+    resp = client.get("/books/search", params={"q": 'tolstoy"*'})
+    assert resp.json()["items"] == []
+
+def test_read_book_cache_and_etag(client, make_auth_header, book_payload):
+    auth_header = make_auth_header()
+    book_id = client.post("/books/", json=book_payload, headers=auth_header).json()["id"]
+
+    resp = client.get(f"/books/{book_id}")
+    etag = resp.headers["etag"]
+    stats = client.get("/books/cache/stats", headers=auth_header).json()
+
+    # Cached copy answers conditional requests without a body
+    resp = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    assert resp.content == b""
+    new_stats = client.get("/books/cache/stats", headers=auth_header).json()
+    assert new_stats["hits"] == stats["hits"] + 1
+
+    # Writes invalidate the cached copy
+    client.put(f"/books/{book_id}", json={"copies": 5}, headers=auth_header)
+    resp = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["copies"] == 5
+    assert resp.headers["etag"] != etag
+
+def test_stale_read_does_not_refill_cache_after_write(client, make_auth_header, book_payload, monkeypatch):
+    from app.services import book_service
+
+    book_id = client.post("/books/", json=book_payload, headers=make_auth_header()).json()["id"]
+    load = book_service.get_by_id_or_404
+
+    async def load_then_write(db, model, id):
+        book = await load(db, model, id)
+        # Another request renames the book between this load and the cache fill
+        async with unit_of_work(TestingSessionLocal) as other:
+            await BookService.update_book(other, book_id, BookUpdate(title="Renamed"))
+        return book
+
+    monkeypatch.setattr(book_service, "get_by_id_or_404", load_then_write)
+    assert client.get(f"/books/{book_id}").json()["title"] == book_payload["title"]
+    monkeypatch.undo()
+    assert client.get(f"/books/{book_id}").json()["title"] == "Renamed"
+
+def _touch_book(book_id, **values):
+    """Write to a book a minute from now, beyond SQLite's one-second updated_at resolution."""
+    async def run():
+        async with TestingSessionLocal() as db:
+            await db.execute(
+                update(Book)
+                .where(Book.id == book_id)
+                .values(updated_at=datetime.now(timezone.utc) + timedelta(minutes=1), **values)
+            )
+            await db.commit()
+    asyncio.run(run())
+
+def test_list_books_conditional_requests(client, make_auth_header, monkeypatch):
+    auth_header = make_auth_header()
+    ids = [
+        client.post("/books/", json={"title": f"Book {i}", "author": "Alice"}, headers=auth_header).json()["id"]
+        for i in range(3)
+    ]
+    resp = client.get("/books/", params={"limit": 2})
+    etag = resp.headers["etag"]
+    assert resp.headers["cache-control"] == settings.CATALOG_CACHE_CONTROL
+    # Pages have no Last-Modified, it could not reflect deletions
+    assert "last-modified" not in resp.headers
+
+    # A matching ETag is answered from the (id, updated_at) query alone
+    calls = []
+    list_books = BookService.list_books
+    async def spy(db, **kwargs):
+        calls.append(kwargs.get("columns"))
+        return await list_books(db, **kwargs)
+    monkeypatch.setattr(BookService, "list_books", spy)
+    resp = client.get("/books/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+    assert calls == [(Book.id, Book.updated_at)]
+    resp = client.get("/books/", params={"limit": 2}, headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert resp.status_code == status.HTTP_200_OK
+
+    # Each page and filter has its own ETag
+    assert client.get("/books/", params={"limit": 3}).headers["etag"] != etag
+
+    # Writes to books on the page, deletes and new books change it
+    _touch_book(ids[1], title="Renamed")
+    resp = client.get("/books/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["items"][1]["title"] == "Renamed"
+    assert resp.headers["etag"] != etag
+
+    etag = resp.headers["etag"]
+    client.delete(f"/books/{ids[0]}", headers=auth_header)
+    resp = client.get("/books/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_200_OK
+    etag = resp.headers["etag"]
+    client.post("/books/", json={"title": "New", "author": "Alice"}, headers=auth_header)
+    resp = client.get("/books/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["next_cursor"] is not None
+
+    # Deleting the last book of a page changes its ETag too
+    etag = resp.headers["etag"]
+    client.delete(f"/books/{resp.json()['items'][1]['id']}", headers=auth_header)
+    resp = client.get("/books/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["etag"] != etag
+
+def test_read_book_last_modified_and_cache_control(client, make_auth_header, book_payload, monkeypatch):
+    auth_header = make_auth_header()
+    book_id = client.post("/books/", json=book_payload, headers=auth_header).json()["id"]
+    resp = client.get(f"/books/{book_id}")
+    last_modified = resp.headers["last-modified"]
+    assert resp.headers["cache-control"] == settings.CATALOG_CACHE_CONTROL
+
+    resp = client.get(f"/books/{book_id}", headers={"If-Modified-Since": last_modified})
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    # If-None-Match takes precedence over If-Modified-Since
+    resp = client.get(f"/books/{book_id}", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert resp.status_code == status.HTTP_200_OK
+    resp = client.get(f"/books/{book_id}", headers={"If-Modified-Since": "not a date"})
+    assert resp.status_code == status.HTTP_200_OK
+
+    _touch_book(book_id, title="Renamed")
+    asyncio.run(BookService.invalidate_cached(book_id))
+    resp = client.get(f"/books/{book_id}", headers={"If-Modified-Since": last_modified})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["title"] == "Renamed"
+
+    monkeypatch.setattr(settings, "CATALOG_CACHE_CONTROL", "")
+    assert "cache-control" not in client.get(f"/books/{book_id}").headers
+
+def test_unit_of_work_commits_once_then_invalidates(client, make_auth_header, book_payload):
+    auth_header = make_auth_header()
+    book_id = client.post("/books/", json=book_payload, headers=auth_header).json()["id"]
+    client.get(f"/books/{book_id}")  # cached
+
+    async def run():
+        async with unit_of_work(TestingSessionLocal) as db:
+            await BookService.update_book(db, book_id, BookUpdate(title="Renamed"))
+            await BookService.create_book(db, BookCreate(title="Second", author="Bob"))
+            # Dropped from the cache only once committed
+            assert await book_cache.get(str(book_id)) is not None
+        with pytest.raises(RuntimeError):
+            async with unit_of_work(TestingSessionLocal) as db:
+                await BookService.create_book(db, BookCreate(title="Rolled back", author="Bob"))
+                raise RuntimeError
+    asyncio.run(run())
+
+    assert client.get(f"/books/{book_id}").json()["title"] == "Renamed"
+    titles = [book["title"] for book in client.get("/books/").json()["items"]]
+    assert titles == ["Renamed", "Second"]
+
+def test_patch_book_with_if_match(client, make_auth_header, book_payload):
+    auth_header = make_auth_header()
+    book = client.post("/books/", json=book_payload, headers=auth_header).json()
+    assert book["version"] == 1
+    url = f"/books/{book['id']}"
+
+    resp = client.patch(url, json={"title": "Patched"}, headers={**auth_header, "If-Match": '"1"'})
+    assert resp.status_code == status.HTTP_200_OK
+    patched = resp.json()
+    assert (patched["title"], patched["author"], patched["version"]) == ("Patched", book_payload["author"], 2)
+    assert client.get(url).json()["title"] == "Patched"
+
+    # A concurrent edit made from version 1 is refused and changes nothing
+    resp = client.patch(url, json={"title": "Lost update"}, headers={**auth_header, "If-Match": '"1"'})
+    assert resp.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert client.get(url).json()["title"] == "Patched"
+    resp = client.patch(url, json={}, headers={**auth_header, "If-Match": '"1"'})
+    assert resp.status_code == status.HTTP_412_PRECONDITION_FAILED
+    resp = client.patch(url, json={"copies": 5}, headers={**auth_header, "If-Match": "not-a-version"})
+    assert resp.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    # Without If-Match, or with *, the update is unconditional
+    resp = client.patch(url, json={"copies": 5}, headers={**auth_header, "If-Match": "*"})
+    assert (resp.json()["copies"], resp.json()["total_copies"], resp.json()["version"]) == (5, 5, 3)
+    assert client.patch(url, json={"copies": 4}, headers=auth_header).json()["version"] == 4
+
+    resp = client.patch("/books/999999", json={"title": "X"}, headers={**auth_header, "If-Match": '"1"'})
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert client.patch("/books/999999", json={"title": "X"}, headers=auth_header).status_code == 404
+
+def test_update_book_with_if_match_etag(client, make_auth_header, book_payload):
+    auth_header = make_auth_header()
+    book_id = client.post("/books/", json=book_payload, headers=auth_header).json()["id"]
+    url = f"/books/{book_id}"
+    etag = client.get(url).headers["etag"]
+
+    # The ETag of GET /books/{id} works as If-Match, like the version
+    resp = client.patch(url, json={"title": "Patched"}, headers={**auth_header, "If-Match": etag})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["version"] == 2
+    # It no longer matches once the book changed
+    resp = client.put(url, json={**book_payload, "title": "Lost update"}, headers={**auth_header, "If-Match": etag})
+    assert resp.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    etag = client.get(url).headers["etag"]
+    # If-Match compares strongly
+    resp = client.patch(url, json={"title": "Weak"}, headers={**auth_header, "If-Match": f"W/{etag}"})
+    assert resp.status_code == status.HTTP_412_PRECONDITION_FAILED
+    resp = client.put(
+        url, json={**book_payload, "title": "Put"}, headers={**auth_header, "If-Match": f'"other", {etag}'}
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert client.get(url).json()["title"] == "Put"
+    resp = client.patch("/books/999999", json={"title": "X"}, headers={**auth_header, "If-Match": etag})
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+def test_books_batch(client, make_auth_header):
+    auth_header = make_auth_header()
+    ids = [
+        client.post("/books/", json={"title": f"Batch {i}", "author": "Alice"}, headers=auth_header).json()["id"]
+        for i in range(3)
+    ]
+    requested = [ids[2], 999999, ids[0], ids[2]]
+
+    resp = client.get("/books/batch", params={"ids": ",".join(map(str, requested))})
+    assert resp.status_code == status.HTTP_200_OK
+    results = resp.json()["results"]
+    assert [item["id"] for item in results] == requested
+    assert [item["status_code"] for item in results] == [200, 404, 200, 200]
+    assert results[0]["book"] == client.get(f"/books/{ids[2]}").json()
+    assert results[1] == {"id": 999999, "status_code": 404, "detail": "Book with id=999999 not found", "book": None}
+
+    # Repeated ids and the POST variant give the same results
+    assert client.get("/books/batch", params={"ids": requested}).json()["results"] == results
+    assert client.post("/books/batch", json={"ids": requested}).json()["results"] == results
+
+    assert client.get("/books/batch", params={"ids": "1,x"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/books/batch", params={"ids": ""}).status_code == status.HTTP_400_BAD_REQUEST
+    too_many = ",".join(str(i) for i in range(settings.MAX_PAGE_SIZE + 1))
+    assert client.get("/books/batch", params={"ids": too_many}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.post("/books/batch", json={"ids": []}).status_code == 422
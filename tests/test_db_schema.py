@@ -47,3 +47,18 @@ def test_reader_phone_column(engine):
     assert (
         hasattr(col_type, 'length') or str(col_type).lower().startswith('varchar')
     ), f"Unexpected column type for 'phone': {col_type}"
+
+def test_active_loan_partial_indexes(engine):
+    """Check that the active-loan lookups on 'loans' are backed by partial indexes."""
+    inspector = inspect(engine)
+    indexes = {index['name']: index for index in inspector.get_indexes('loans')}
+    expected = {
+        'ix_loans_reader_id_active': ['reader_id'],
+        'ix_loans_book_id_reader_id_active': ['book_id', 'reader_id'],
+    }
+    for name, columns in expected.items():
+        assert name in indexes, f"No index '{name}' on 'loans'. Maybe Alembic migrations are not applied."
+        assert indexes[name]['column_names'] == columns
+        if engine.dialect.name == 'postgresql':
+            predicate = indexes[name]['dialect_options'].get('postgresql_where', '')
+            assert 'return_date IS NULL' in str(predicate), f"Index '{name}' must be partial"
@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+import uuid
+from fastapi import status
+
+
+def test_export_requires_auth(client):
+    resp = client.get("/export/books")
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_export_ndjson_and_csv(client, make_auth_header):
+    auth_header = make_auth_header()
+    book_ids = []
+    for i in range(3):
+        resp = client.post(
+            "/books/",
+            json={"title": f"Book {i}", "author": "Author", "copies": 2},
+            headers=auth_header
+        )
+        book_ids.append(resp.json()["id"])
+    reader = client.post(
+        "/readers/",
+        json={"name": "Reader", "email": f"r_{uuid.uuid4().hex}@example.com", "phone": "9513219876"},
+        headers=auth_header
+    ).json()
+    client.post("/loans/", json={"book_id": book_ids[0], "reader_id": reader["id"]}, headers=auth_header)
+
+    resp = client.get("/export/books", headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["id"] for row in rows] == book_ids
+    assert rows[0]["title"] == "Book 0"
+    assert rows[0]["version"] == 1
+
+    resp = client.get("/export/loans", headers=auth_header)
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["book_id"] == book_ids[0]
+    assert rows[0]["return_date"] is None
+    assert rows[0]["due_date"] > rows[0]["loan_date"]
+
+    resp = client.get("/export/readers", params={"format": "csv"}, headers=auth_header)
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert rows[0]["email"] == reader["email"]
+    assert rows[0]["version"] == "1"
+
+    resp = client.get("/export/users", headers=auth_header)
+    assert resp.status_code == 422
@@ -1,7 +1,21 @@
+import asyncio
 import pytest
-from fastapi import status
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 import uuid
 
+from app.core.cache import book_cache
+from app.core.config import settings
+from app.db import Base
+from app.models.book import Book
+from app.models.loan import Loan
+from app.models.reader import Reader
+from app.schemas.loan import LoanCreate
+from app.services.loan_service import LoanService
+from tests.conftest import TestingSessionLocal
+
 @pytest.fixture
 def setup_entities(client, make_auth_header):
     """Creates a book and a reader with unique data for testing."""
@@ -59,6 +73,7 @@ def test_return_book_and_copy_increment(client, setup_entities):
         "/loans/", json={"book_id": book_id, "reader_id": reader_id}, headers=auth_header
     )
     assert resp.status_code == status.HTTP_201_CREATED
+    assert client.get(f"/books/{book_id}").json()["copies"] == 0
 
     # Return the book
     resp = client.post(
@@ -92,3 +107,280 @@ def test_get_loans_by_reader(client, setup_entities):
     assert isinstance(data, list)
     assert data[0]["reader_id"] == reader_id
     assert data[0]["return_date"] is None
+
+
+async def _checkout_concurrently(db_url, copies, readers, loans):
+    """
+    Run `loans` concurrent checkouts, each in its own connection, of a book with
+    `copies` copies; loan i goes to reader i % readers. Returns
+    (status codes, copies left, loans stored).
+    """
+    engine = create_async_engine(db_url, poolclass=NullPool, connect_args={"timeout": 30})
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with Session() as db:
+        book = Book(title="Contended", author="Author", copies=copies)
+        reader_rows = [Reader(name=f"R{i}", email=f"r{i}@example.com") for i in range(readers)]
+        db.add_all([book, *reader_rows])
+        await db.commit()
+        reader_ids = [reader.id for reader in reader_rows]
+
+    async def checkout(i):
+        async with Session() as db:
+            try:
+                await LoanService.create_loan(
+                    db, LoanCreate(book_id=book.id, reader_id=reader_ids[i % readers])
+                )
+                return status.HTTP_201_CREATED
+            except HTTPException as exc:
+                return exc.status_code
+
+    statuses = await asyncio.gather(*(checkout(i) for i in range(loans)))
+    async with Session() as db:
+        copies_left = await db.scalar(select(Book.copies).where(Book.id == book.id))
+        stored = await db.scalar(select(func.count(Loan.id)))
+    await engine.dispose()
+    return statuses, copies_left, stored
+
+
+@pytest.mark.anyio
+async def test_concurrent_checkouts_do_not_oversell(tmp_path):
+    statuses, copies_left, stored = await _checkout_concurrently(
+        f"sqlite+aiosqlite:///{tmp_path / 'loans.db'}", copies=3, readers=12, loans=12
+    )
+    assert statuses.count(status.HTTP_201_CREATED) == 3
+    assert statuses.count(status.HTTP_400_BAD_REQUEST) == 9
+    assert copies_left == 0
+    assert stored == 3
+
+
+@pytest.mark.anyio
+async def test_concurrent_checkouts_respect_reader_limit(tmp_path):
+    statuses, copies_left, stored = await _checkout_concurrently(
+        f"sqlite+aiosqlite:///{tmp_path / 'loans.db'}", copies=10, readers=1, loans=8
+    )
+    assert statuses.count(status.HTTP_201_CREATED) == 3
+    assert copies_left == 7
+    assert stored == 3
+
+
+def test_bulk_checkout_and_return(client, setup_entities):
+    book_id, reader_id, auth_header = setup_entities
+    book_ids = [book_id]
+    for i, copies in enumerate([1, 0, 2, 1]):
+        resp = client.post(
+            "/books/",
+            json={"title": f"Bulk{i}_{uuid.uuid4().hex}", "author": "Author", "copies": copies},
+            headers=auth_header
+        )
+        book_ids.append(resp.json()["id"])
+    # book_ids[2] has no copies; only 3 of the remaining books fit the loan limit
+    requested = book_ids + [999999]
+    resp = client.post(
+        "/loans/bulk", json={"reader_id": reader_id, "book_ids": requested}, headers=auth_header
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    results = resp.json()["results"]
+    assert [item["book_id"] for item in results] == requested
+    assert [item["status_code"] for item in results] == [201, 201, 400, 201, 400, 404]
+    assert results[0]["loan"]["reader_id"] == reader_id
+    assert results[4]["detail"] == "Reader has already borrowed 3 books"
+
+    # Copies are taken only for granted loans
+    assert client.get(f"/books/{book_ids[3]}").json()["copies"] == 1
+    assert client.get(f"/books/{book_ids[4]}").json()["copies"] == 1
+    assert len(client.get(f"/loans/{reader_id}", headers=auth_header).json()) == 3
+
+    resp = client.post(
+        "/loans/return/bulk",
+        json={"reader_id": reader_id, "book_ids": [book_ids[0], book_ids[3], book_ids[4]]},
+        headers=auth_header
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert [item["status_code"] for item in resp.json()["results"]] == [200, 200, 404]
+    assert client.get(f"/books/{book_ids[3]}").json()["copies"] == 2
+    assert len(client.get(f"/loans/{reader_id}", headers=auth_header).json()) == 1
+
+
+def test_bulk_checkout_rejects_duplicate_books(client, setup_entities):
+    book_id, reader_id, auth_header = setup_entities
+    for path in ("/loans/bulk", "/loans/return/bulk"):
+        resp = client.post(
+            path, json={"reader_id": reader_id, "book_ids": [book_id, book_id]}, headers=auth_header
+        )
+        assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.get(f"/books/{book_id}").json()["copies"] == 1
+
+
+def test_bulk_checkout_unknown_reader(client, setup_entities):
+    book_id, _, auth_header = setup_entities
+    resp = client.post(
+        "/loans/bulk", json={"reader_id": 999999, "book_ids": [book_id]}, headers=auth_header
+    )
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    # The copy taken before the reader check is rolled back
+    assert client.get(f"/books/{book_id}").json()["copies"] == 1
+
+
+def test_availability_counters_and_reconcile(client, setup_entities):
+    book_id, reader_id, auth_header = setup_entities
+    client.put(f"/books/{book_id}", json={"copies": 3}, headers=auth_header)
+    client.post("/loans/", json={"book_id": book_id, "reader_id": reader_id}, headers=auth_header)
+
+    resp = client.get("/books/availability", params={"ids": [book_id, 999999]})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == [
+        {"id": book_id, "total_copies": 3, "available_copies": 2, "on_loan": 1}
+    ]
+    # Editing the available copies keeps the loaned one accounted for
+    client.put(f"/books/{book_id}", json={"copies": 4}, headers=auth_header)
+    assert client.get(f"/books/{book_id}").json()["total_copies"] == 5
+
+    async def drift_and_reconcile():
+        async with TestingSessionLocal() as db:
+            await db.execute(update(Book).values(copies=0))
+            await db.execute(update(Reader).values(active_loans=0))
+            await db.commit()
+            return await LoanService.reconcile_counters(db)
+
+    asyncio.run(book_cache.set(str(book_id), b"stale"))
+    assert asyncio.run(drift_and_reconcile()) == (1, 1)
+    # Corrected books are dropped from the cache
+    assert not asyncio.run(book_cache.get(str(book_id)))
+    availability = client.get("/books/availability", params={"ids": book_id}).json()[0]
+    assert (availability["available_copies"], availability["on_loan"]) == (4, 1)
+
+    client.post("/loans/return", json={"book_id": book_id, "reader_id": reader_id}, headers=auth_header)
+    availability = client.get("/books/availability", params={"ids": book_id}).json()[0]
+    assert (availability["total_copies"], availability["available_copies"]) == (5, 5)
+    assert asyncio.run(drift_and_reconcile()) == (1, 0)
+
+
+def test_deleting_book_frees_reader_slot(client, setup_entities):
+    book_id, reader_id, auth_header = setup_entities
+    client.post("/loans/", json={"book_id": book_id, "reader_id": reader_id}, headers=auth_header)
+    client.delete(f"/books/{book_id}", headers=auth_header)
+
+    async def reader_active_loans():
+        async with TestingSessionLocal() as db:
+            return await db.scalar(select(Reader.active_loans).where(Reader.id == reader_id))
+
+    assert asyncio.run(reader_active_loans()) == 0
+
+
+def _loan_count(**filters):
+    async def run():
+        async with TestingSessionLocal() as db:
+            return await db.scalar(select(func.count(Loan.id)).filter_by(**filters))
+    return asyncio.run(run())
+
+
+def test_bulk_delete_books_cascades_to_loans(client, setup_entities):
+    book_id, reader_id, auth_header = setup_entities
+    other = client.post("/books/", json={"title": "Other", "author": "A", "copies": 2}, headers=auth_header).json()
+    kept = client.post("/books/", json={"title": "Kept", "author": "A"}, headers=auth_header).json()
+    # History and an active loan of each deleted book, plus a loan of a kept one
+    for bid in (book_id, other["id"]):
+        client.post("/loans/", json={"book_id": bid, "reader_id": reader_id}, headers=auth_header)
+        client.post("/loans/return", json={"book_id": bid, "reader_id": reader_id}, headers=auth_header)
+        client.post("/loans/", json={"book_id": bid, "reader_id": reader_id}, headers=auth_header)
+    client.post("/loans/", json={"book_id": kept["id"], "reader_id": reader_id}, headers=auth_header)
+
+    resp = client.delete(
+        "/books/", params={"ids": [other["id"], 999999, book_id, other["id"]]}, headers=auth_header
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"deleted": [other["id"], book_id], "not_found": [999999]}
+    assert client.get(f"/books/{book_id}").status_code == status.HTTP_404_NOT_FOUND
+    assert _loan_count(book_id=book_id) == _loan_count(book_id=other["id"]) == 0
+    # The reader keeps the kept book's loan and has their two slots back
+    assert [loan["book_id"] for loan in client.get(f"/loans/{reader_id}", headers=auth_header).json()] == [kept["id"]]
+
+    async def reader_active_loans():
+        async with TestingSessionLocal() as db:
+            return await db.scalar(select(Reader.active_loans).where(Reader.id == reader_id))
+    assert asyncio.run(reader_active_loans()) == 1
+
+    too_many = list(range(1, settings.MAX_PAGE_SIZE + 2))
+    assert client.delete("/books/", params={"ids": too_many}, headers=auth_header).status_code == 400
+    assert client.delete("/books/", params={"ids": [1]}).status_code == status.HTTP_401_UNAUTHORIZED
+    # Without ids nothing is deleted
+    assert client.delete("/books/", headers=auth_header).status_code == 422
+    assert client.delete("/books/", params={"ids": ""}, headers=auth_header).status_code == 422
+    assert client.get(f"/books/{kept['id']}").status_code == status.HTTP_200_OK
+
+
+def test_delete_reader_cascades_to_loans(client, setup_entities):
+    book_id, reader_id, auth_header = setup_entities
+    for _ in range(3):
+        client.post("/loans/", json={"book_id": book_id, "reader_id": reader_id}, headers=auth_header)
+        client.post("/loans/return", json={"book_id": book_id, "reader_id": reader_id}, headers=auth_header)
+    client.post("/loans/", json={"book_id": book_id, "reader_id": reader_id}, headers=auth_header)
+    assert client.get(f"/books/{book_id}").json()["copies"] == 0
+
+    assert client.delete(f"/readers/{reader_id}", headers=auth_header).status_code == status.HTTP_204_NO_CONTENT
+    assert _loan_count(reader_id=reader_id) == 0
+    assert client.get(f"/books/{book_id}").json()["copies"] == 1
+    assert client.delete(f"/readers/{reader_id}", headers=auth_header).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_loans_by_reader_checks_reader(client, setup_entities):
+    _, reader_id, auth_header = setup_entities
+    resp = client.get(f"/loans/{reader_id}", headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == []
+    resp = client.get("/loans/999999", headers=auth_header)
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_loan_history(client, setup_entities, monkeypatch):
+    book_id, reader_id, auth_header = setup_entities
+    book_ids = [book_id]
+    for i in range(2):
+        resp = client.post(
+            "/books/",
+            json={"title": f"History {i}", "author": f"Author {i}", "copies": 1},
+            headers=auth_header
+        )
+        book_ids.append(resp.json()["id"])
+    for bid in book_ids:
+        client.post("/loans/", json={"book_id": bid, "reader_id": reader_id}, headers=auth_header)
+    client.post("/loans/return", json={"book_id": book_ids[0], "reader_id": reader_id}, headers=auth_header)
+
+    resp = client.get(f"/loans/{reader_id}/history", params={"limit": 2}, headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    page = resp.json()
+    assert page["reader"] == {"id": reader_id, "name": "Reader"}
+    assert [item["book"]["id"] for item in page["items"]] == book_ids[:0:-1]
+    assert page["items"][0]["book"] == {"id": book_ids[2], "title": "History 1", "author": "Author 1"}
+    resp = client.get(
+        f"/loans/{reader_id}/history", params={"limit": 2, "after": page["next_cursor"]}, headers=auth_header
+    )
+    page = resp.json()
+    assert [item["book"]["id"] for item in page["items"]] == [book_ids[0]]
+    assert page["next_cursor"] is None
+
+    resp = client.get(f"/loans/{reader_id}/history", params={"status": "returned"}, headers=auth_header)
+    assert [item["book"]["id"] for item in resp.json()["items"]] == [book_ids[0]]
+    resp = client.get(f"/loans/{reader_id}/history", params={"status": "active"}, headers=auth_header)
+    assert len(resp.json()["items"]) == 2
+    resp = client.get(
+        f"/loans/{reader_id}/history", params={"loaned_to": "2000-01-01T00:00:00"}, headers=auth_header
+    )
+    assert resp.json()["items"] == []
+
+    # A tight byte budget cuts the page short, and the cursor resumes after it
+    monkeypatch.setattr(settings, "MAX_PAGE_BYTES", 1)
+    seen = []
+    params = {}
+    while True:
+        page = client.get(f"/loans/{reader_id}/history", params=params, headers=auth_header).json()
+        assert len(page["items"]) == 1
+        seen.append(page["items"][0]["book"]["id"])
+        if page["next_cursor"] is None:
+            break
+        params = {"after": page["next_cursor"]}
+    assert seen == book_ids[::-1]
+
+    assert client.get("/loans/999999/history", headers=auth_header).status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import instrumentation
+from app.core.config import settings
+from app.core.instrumentation import REQUEST_QUERIES, REQUEST_SECONDS, REQUESTS, current_request_stats
+from app.db import InstrumentedAsyncQueuePool, POOL_CHECKOUT_SECONDS, POOL_TIMEOUTS, POOL_WAITS
+from app.services.loan_service import LoanService
+
+
+def test_metrics_endpoint(client):
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "# TYPE db_pool_checkout_seconds histogram" in resp.text
+    assert "# TYPE db_pool_waits_total counter" in resp.text
+
+
+def test_pool_records_checkouts_waits_and_timeouts(tmp_path):
+    async def scenario():
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+        checkouts = POOL_CHECKOUT_SECONDS.count(engine="async")
+        waits = POOL_WAITS.value(engine="async")
+        timeouts = POOL_TIMEOUTS.value(engine="async")
+
+        conn = await engine.connect()
+        assert POOL_CHECKOUT_SECONDS.count(engine="async") == checkouts + 1
+        # The only connection is taken: the next checkout waits and times out
+        with pytest.raises(exc.TimeoutError):
+            await engine.connect()
+        assert POOL_WAITS.value(engine="async") == waits + 1
+        assert POOL_TIMEOUTS.value(engine="async") == timeouts + 1
+        await conn.close()
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_failed_queries_do_not_skew_query_timings(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'timing.db'}")
+    instrumentation.instrument_engine(engine)
+    timed = instrumentation.QUERY_SECONDS.count(engine="sqlite")
+
+    with engine.connect() as conn:
+        with pytest.raises(exc.OperationalError):
+            conn.exec_driver_sql("SELECT * FROM missing_table")
+        conn.exec_driver_sql("SELECT 1")
+        # No start time of the failed statement is left on the connection
+        assert not conn.info.get("query_start")
+    assert instrumentation.QUERY_SECONDS.count(engine="sqlite") == timed + 1
+    engine.dispose()
+
+
+def test_requests_are_timed_per_route(client, make_auth_header):
+    auth_header = make_auth_header()
+    book_id = client.post("/books/", json={"title": "Metered", "author": "A"}, headers=auth_header).json()["id"]
+    labels = {"method": "GET", "route": "/books/{book_id}"}
+    requests = REQUESTS.value(status="200", **labels)
+    timed = REQUEST_SECONDS.count(**labels)
+
+    resp = client.get(f"/books/{book_id}")
+    assert REQUESTS.value(status="200", **labels) == requests + 1
+    assert REQUEST_SECONDS.count(**labels) == timed + 1
+    assert client.get("/books/999999").status_code == 404
+    assert REQUESTS.value(status="404", **labels) >= 1
+
+    text = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/books/{book_id}",status="200"}' in text
+    assert "http_requests_in_flight " in text
+    size_sum = f'http_response_size_bytes_sum{{method="GET",route="/books/{{book_id}}"}}'
+    assert any(line.startswith(size_sum) and float(line.split()[-1]) >= len(resp.content) for line in text.splitlines())
+
+
+def test_queries_are_counted_per_request(client, make_auth_header, monkeypatch):
+    auth_header = make_auth_header()
+    reader = client.post(
+        "/readers/", json={"name": "R", "email": "metered@example.com", "phone": "1"}, headers=auth_header
+    ).json()
+    seen = []
+    original = LoanService.get_loans_by_reader
+
+    async def spy(*args, **kwargs):
+        result = await original(*args, **kwargs)
+        seen.append(current_request_stats().queries)
+        return result
+    monkeypatch.setattr(LoanService, "get_loans_by_reader", spy)
+
+    labels = {"method": "GET", "route": "/loans/{reader_id}"}
+    counted = REQUEST_QUERIES.count(**labels)
+    client.get(f"/loans/{reader['id']}", headers=auth_header)
+    # No active loans: the loans query, then the reader existence check
+    assert seen == [2]
+    assert REQUEST_QUERIES.count(**labels) == counted + 1
+    assert current_request_stats() is None
+
+
+def test_requests_over_the_query_threshold_are_logged(client, make_auth_header, monkeypatch, caplog):
+    auth_header = make_auth_header()
+    monkeypatch.setattr(settings, "REQUEST_QUERY_WARN_THRESHOLD", 1)
+    with caplog.at_level(logging.WARNING, logger="app.core.instrumentation"):
+        client.get("/readers/", headers=auth_header)
+    assert any("GET /readers/ ran" in record.getMessage() for record in caplog.records)
+
+    caplog.clear()
+    monkeypatch.setattr(settings, "REQUEST_QUERY_WARN_THRESHOLD", 0)
+    with caplog.at_level(logging.WARNING, logger="app.core.instrumentation"):
+        client.get("/readers/", headers=auth_header)
+    assert caplog.records == []
+
+
+@pytest.fixture
+def request_stats(monkeypatch):
+    """List collecting the RequestStats of every request made by the test."""
+    seen = []
+
+    class RecordingStats(instrumentation.RequestStats):
+        def __init__(self):
+            super().__init__()
+            seen.append(self)
+    monkeypatch.setattr(instrumentation, "RequestStats", RecordingStats)
+    return seen
+
+
+def test_write_endpoints_run_minimal_statements(client, make_auth_header, request_stats):
+    auth_header = make_auth_header()
+    client.get("/readers/", headers=auth_header)  # caches the principal
+    seen = request_stats
+
+    def queries(resp, status_code):
+        assert resp.status_code == status_code
+        return seen[-1].queries
+
+    # Generated columns come back through RETURNING: no refresh after commit
+    book = client.post("/books/", json={"title": "T", "author": "A"}, headers=auth_header)
+    assert queries(book, 201) == 1
+    assert queries(client.put(f"/books/{book.json()['id']}", json={"copies": 2}, headers=auth_header), 200) == 1
+    assert queries(client.put("/books/999999", json={"copies": 2}, headers=auth_header), 404) == 1
+    # Email check, then the INSERT
+    reader = client.post(
+        "/readers/", json={"name": "R", "email": "counted@example.com", "phone": "1"}, headers=auth_header
+    )
+    assert queries(reader, 201) == 2
+    assert queries(client.put(f"/readers/{reader.json()['id']}", json={"name": "S"}, headers=auth_header), 200) == 1
+    resp = client.post("/auth/register", json={"email": "counted@example.com", "password": "secret123"})
+    assert queries(resp, 201) == 2
+    # Loans go by ON DELETE CASCADE, not one DELETE each: lock, counters, delete
+    assert queries(client.delete(f"/books/{book.json()['id']}", headers=auth_header), 204) == 3
+    assert queries(client.delete(f"/readers/{reader.json()['id']}", headers=auth_header), 204) == 2
+
+
+
+def test_batch_fetch_is_one_query(client, make_auth_header, request_stats):
+    auth_header = make_auth_header()
+    ids = [
+        client.post("/books/", json={"title": f"B{i}", "author": "A"}, headers=auth_header).json()["id"]
+        for i in range(5)
+    ]
+    resp = client.get("/books/batch", params={"ids": ",".join(map(str, ids + [999999]))})
+    assert len(resp.json()["results"]) == 6
+    assert request_stats[-1].queries == 1
@@ -0,0 +1,125 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import status
+from sqlalchemy import update
+
+from app.core.scheduler import PeriodicTask
+from app.models.loan import Loan
+from app.services.overdue_service import OverdueService
+from tests.conftest import TestingSessionLocal
+
+
+def _set_due_date(loan_id: int, due_date: datetime) -> None:
+    async def run():
+        async with TestingSessionLocal() as db:
+            await db.execute(update(Loan).where(Loan.id == loan_id).values(due_date=due_date))
+            await db.commit()
+    asyncio.run(run())
+
+
+def _scan():
+    async def run():
+        async with TestingSessionLocal() as db:
+            return await OverdueService.scan(db)
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def loans(client, make_auth_header):
+    """Two readers with one and two loans; returns (auth header, [(loan, reader)...])."""
+    auth_header = make_auth_header()
+    made = []
+    for name, count in (("First", 1), ("Second", 2)):
+        reader = client.post(
+            "/readers/",
+            json={"name": name, "email": f"r_{uuid.uuid4().hex}@example.com", "phone": "9513219876"},
+            headers=auth_header
+        ).json()
+        for i in range(count):
+            book = client.post(
+                "/books/", json={"title": f"{name} {i}", "author": "Author"}, headers=auth_header
+            ).json()
+            loan = client.post(
+                "/loans/", json={"book_id": book["id"], "reader_id": reader["id"]}, headers=auth_header
+            ).json()
+            made.append((loan, reader))
+    return auth_header, made
+
+
+def test_due_date_follows_loan_period(loans):
+    _, made = loans
+    loan = made[0][0]
+    period = datetime.fromisoformat(loan["due_date"]) - datetime.fromisoformat(loan["loan_date"])
+    assert abs(period - timedelta(days=14)) < timedelta(minutes=1)
+
+
+def test_overdue_listing(client, loans):
+    auth_header, made = loans
+    now = datetime.now(timezone.utc)
+    for days, (loan, _) in zip([3, 1, 5], made):
+        _set_due_date(loan["id"], now - timedelta(days=days))
+
+    resp = client.get("/loans/overdue", params={"limit": 2}, headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    page = resp.json()
+    assert [item["id"] for item in page["items"]] == [made[2][0]["id"], made[0][0]["id"]]
+    assert page["items"][0]["reader"]["name"] == "Second"
+    assert page["items"][0]["book"]["title"] == "Second 1"
+
+    page = client.get(
+        "/loans/overdue", params={"limit": 2, "after": page["next_cursor"]}, headers=auth_header
+    ).json()
+    assert [item["id"] for item in page["items"]] == [made[1][0]["id"]]
+    assert page["next_cursor"] is None
+
+
+def test_overdue_scan_is_incremental(client, loans):
+    auth_header, made = loans
+    (first_loan, first), (second_loan, second), (third_loan, _) = made
+    now = datetime.now(timezone.utc)
+    _set_due_date(first_loan["id"], now - timedelta(days=2))
+    _set_due_date(second_loan["id"], now - timedelta(days=1))
+
+    assert client.get("/loans/overdue/summary", headers=auth_header).json()["scanned_at"] is None
+    assert _scan() == 2
+    report = client.get("/loans/overdue/summary", headers=auth_header).json()
+    assert report["scanned_at"] is not None
+    assert (report["overdue_loans"], report["readers"]) == (2, 2)
+
+    # Nothing changed: only the readers already in the summary are rechecked
+    assert _scan() == 2
+
+    # The third loan falls due after the last run and the first one is returned
+    _set_due_date(third_loan["id"], datetime.now(timezone.utc))
+    client.post(
+        "/loans/return",
+        json={"book_id": first_loan["book_id"], "reader_id": first["id"]},
+        headers=auth_header
+    )
+    assert _scan() == 1
+    report = client.get("/loans/overdue/summary", headers=auth_header).json()
+    assert (report["overdue_loans"], report["readers"]) == (2, 1)
+    assert report["items"][0]["reader_id"] == second["id"]
+    assert report["items"][0]["overdue_loans"] == 2
+
+
+@pytest.mark.anyio
+async def test_periodic_task_runs_until_stopped():
+    runs = []
+
+    async def job():
+        runs.append(1)
+        if len(runs) == 1:
+            raise RuntimeError("a failing run does not stop the task")
+
+    task = PeriodicTask("test", job)
+    task.start(0.01)
+    await asyncio.sleep(0.1)
+    await task.stop()
+    count = len(runs)
+    assert count >= 2
+    await asyncio.sleep(0.03)
+    assert len(runs) == count
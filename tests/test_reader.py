@@ -45,4 +45,39 @@ def test_crud_readers(client, make_auth_header, reader_payload):
     # Not found
     resp = client.get(f"/readers/{rid}", headers=auth_header)
     assert resp.status_code == status.HTTP_404_NOT_FOUND
-    
\ No newline at end of file
+    
+def test_patch_reader_with_if_match(client, make_auth_header, reader_payload):
+    auth_header = make_auth_header()
+    reader = client.post("/readers/", json=reader_payload, headers=auth_header).json()
+    url = f"/readers/{reader['id']}"
+
+    resp = client.patch(url, json={"phone": "111"}, headers={**auth_header, "If-Match": str(reader["version"])})
+    assert resp.status_code == status.HTTP_200_OK
+    assert (resp.json()["phone"], resp.json()["name"], resp.json()["version"]) == ("111", "John Doe", 2)
+
+    resp = client.patch(url, json={"phone": "222"}, headers={**auth_header, "If-Match": '"1"'})
+    assert resp.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert client.get(url, headers=auth_header).json()["phone"] == "111"
+
+    resp = client.patch("/readers/999999", json={"phone": "1"}, headers=auth_header)
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+def test_readers_batch(client, make_auth_header, reader_payload):
+    auth_header = make_auth_header()
+    first = client.post("/readers/", json=reader_payload, headers=auth_header).json()
+    second = client.post(
+        "/readers/", json={**reader_payload, "email": f"other_{uuid.uuid4().hex}@example.com"}, headers=auth_header
+    ).json()
+
+    resp = client.get("/readers/batch", params={"ids": f"{second['id']},999999,{first['id']}"}, headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    results = resp.json()["results"]
+    assert [(item["id"], item["status_code"]) for item in results] == [
+        (second["id"], 200), (999999, 404), (first["id"], 200)
+    ]
+    assert results[0]["reader"] == second
+    assert results[1]["reader"] is None
+
+    resp = client.post("/readers/batch", json={"ids": [first["id"], 999999]}, headers=auth_header)
+    assert [item["status_code"] for item in resp.json()["results"]] == [200, 404]
+    assert client.get("/readers/batch", params={"ids": "1"}).status_code == status.HTTP_401_UNAUTHORIZED
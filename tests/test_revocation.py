@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.core.revocation import BloomFilter, DatabaseRevocationStore, RevocationList, RevocationStore
+from app.models.revoked_token import RevokedToken
+from tests.conftest import TestingSessionLocal
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.anyio
+async def test_revocation_is_shared_between_workers():
+    store = DatabaseRevocationStore()
+    worker_a = RevocationList(store, sync_interval=0, full_sync_interval=3600, capacity=100, error_rate=0.01)
+    worker_b = RevocationList(store, sync_interval=3600, full_sync_interval=3600, capacity=100, error_rate=0.01)
+    async with TestingSessionLocal() as db:
+        assert not await worker_b.is_revoked(db, "token-1")
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+        await worker_a.revoke(db, "token-1", expires_at)
+        assert await worker_a.is_revoked(db, "token-1")
+        # Worker B only learns about it on its next sync
+        assert not await worker_b.is_revoked(db, "token-1")
+        await worker_b.sync(db)
+        assert await worker_b.is_revoked(db, "token-1")
+        assert not await worker_b.is_revoked(db, "token-2")
+
+
+@pytest.mark.anyio
+async def test_sync_reads_only_recent_revocations_between_full_syncs(monkeypatch):
+    store = DatabaseRevocationStore()
+    worker = RevocationList(store, sync_interval=3600, full_sync_interval=3600, capacity=100, error_rate=0.01)
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    calls = []
+    active_jtis = store.active_jtis
+    async def spy(db, since=None):
+        jtis = list(await active_jtis(db, since=since))
+        calls.append((since, jtis))
+        return jtis
+    monkeypatch.setattr(store, "active_jtis", spy)
+    async with TestingSessionLocal() as db:
+        await store.revoke(db, "old", expires_at)
+        # Revoked long ago: only a full sync reads it
+        await db.execute(
+            update(RevokedToken)
+            .where(RevokedToken.jti == "old")
+            .values(updated_at=datetime.now(timezone.utc) - timedelta(hours=1))
+        )
+        await db.commit()
+        await worker.sync(db)
+        assert calls[-1] == (None, ["old"])
+
+        await store.revoke(db, "new", expires_at)
+        await worker.sync(db)
+        since, jtis = calls[-1]
+        assert since is not None and jtis == ["new"]
+        assert await worker.is_revoked(db, "old")
+        assert await worker.is_revoked(db, "new")
+
+        # A due full sync reads everything again
+        worker._next_full_sync = 0.0
+        await worker.sync(db)
+        assert calls[-1][0] is None and sorted(calls[-1][1]) == ["new", "old"]
+
+
+def test_revocation_store_is_abstract():
+    with pytest.raises(TypeError):
+        RevocationStore()
+
+
+@pytest.mark.anyio
+async def test_purge_expired_revocations():
+    store = DatabaseRevocationStore()
+    now = datetime.now(timezone.utc)
+    async with TestingSessionLocal() as db:
+        await store.revoke(db, "expired", now - timedelta(minutes=1))
+        await store.revoke(db, "active", now + timedelta(minutes=5))
+        assert await store.purge_expired(db) == 1
+        assert list(await store.active_jtis(db)) == ["active"]
@@ -0,0 +1,87 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.core.serialization import ORJSONResponse
+from app.schemas.loan import LoanRead
+
+
+@pytest.fixture
+def fast_lists(monkeypatch):
+    """Return a function that sets FAST_LIST_SERIALIZATION for the test."""
+    def _set(enabled: bool) -> None:
+        monkeypatch.setattr(settings, "FAST_LIST_SERIALIZATION", enabled)
+    return _set
+
+
+@pytest.fixture
+def catalog(client, make_auth_header):
+    """A reader holding two books, plus books without optional fields and with non-ASCII text."""
+    auth_header = make_auth_header()
+    reader = client.post(
+        "/readers/",
+        json={"name": "Анна Каренина", "email": f"r_{uuid.uuid4().hex}@example.com", "phone": "9513219876"},
+        headers=auth_header
+    ).json()
+    books = [
+        client.post("/books/", json={
+            "title": "Война и мир", "author": "Толстой", "published_year": 1869,
+            "isbn": "978-5-17-000000-1", "copies": 3, "description": "Роман-эпопея"
+        }, headers=auth_header).json(),
+        client.post("/books/", json={"title": "Untitled", "author": "Anonymous"}, headers=auth_header).json(),
+        client.post("/books/", json={"title": "Third", "author": "Anonymous"}, headers=auth_header).json(),
+    ]
+    for book in books[:2]:
+        client.post("/loans/", json={"book_id": book["id"], "reader_id": reader["id"]}, headers=auth_header)
+    client.post("/loans/return", json={"book_id": books[1]["id"], "reader_id": reader["id"]}, headers=auth_header)
+    client.post("/loans/", json={"book_id": books[1]["id"], "reader_id": reader["id"]}, headers=auth_header)
+    return auth_header, reader
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/books/", {}),
+    ("/books/", {"limit": 2}),
+    ("/books/", {"author": "Anonymous"}),
+    ("/readers/", {}),
+])
+def test_fast_lists_match_regular_path(client, catalog, fast_lists, path, params):
+    auth_header, _ = catalog
+    fast_lists(False)
+    regular = client.get(path, params=params, headers=auth_header)
+    fast_lists(True)
+    fast = client.get(path, params=params, headers=auth_header)
+    assert fast.status_code == regular.status_code == 200
+    assert fast.headers["content-type"] == regular.headers["content-type"]
+    assert fast.content == regular.content
+
+
+def test_fast_active_loans_match_regular_path(client, catalog, fast_lists):
+    auth_header, reader = catalog
+    fast_lists(False)
+    regular = client.get(f"/loans/{reader['id']}", headers=auth_header)
+    fast_lists(True)
+    fast = client.get(f"/loans/{reader['id']}", headers=auth_header)
+    assert len(regular.json()) == 2
+    assert fast.content == regular.content
+
+    # Unknown readers are still a 404
+    assert client.get("/loans/999999", headers=auth_header).status_code == 404
+
+
+def test_utc_datetimes_keep_their_offset():
+    loan = LoanRead(
+        id=1, book_id=1, reader_id=1,
+        loan_date=datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc),
+        due_date=datetime(2026, 1, 15, 12, 0, 0, 5, tzinfo=timezone.utc),
+    )
+    expected = {
+        "book_id": 1, "reader_id": 1, "id": 1,
+        "loan_date": "2026-01-01T12:00:00+00:00",
+        "due_date": "2026-01-15T12:00:00.000005+00:00",
+        "return_date": None,
+    }
+    assert json.loads(loan.model_dump_json()) == expected
+    assert json.loads(ORJSONResponse(loan).body) == expected
@@ -0,0 +1,165 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import status
+from sqlalchemy import select, update
+
+from app.models.loan import Loan
+from app.models.stats import DailyBookStats, DailyReaderStats
+from app.services.stats_service import StatsService
+from tests.conftest import TestingSessionLocal
+
+
+def _rollups():
+    async def run():
+        async with TestingSessionLocal() as db:
+            books = (await db.execute(
+                select(DailyBookStats.day, DailyBookStats.book_id, DailyBookStats.checkouts, DailyBookStats.returns)
+                .order_by(DailyBookStats.day, DailyBookStats.book_id)
+            )).all()
+            readers = (await db.execute(
+                select(DailyReaderStats.day, DailyReaderStats.reader_id, DailyReaderStats.checkouts, DailyReaderStats.returns)
+                .order_by(DailyReaderStats.day, DailyReaderStats.reader_id)
+            )).all()
+            return [tuple(row) for row in books], [tuple(row) for row in readers]
+    return asyncio.run(run())
+
+
+def _set_loan_date(loan_id: int, loan_date: datetime) -> None:
+    async def run():
+        async with TestingSessionLocal() as db:
+            await db.execute(update(Loan).where(Loan.id == loan_id).values(loan_date=loan_date))
+            await db.commit()
+    asyncio.run(run())
+
+
+def _backfill():
+    async def run():
+        async with TestingSessionLocal() as db:
+            return await StatsService.backfill(db)
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def circulation(client, make_auth_header):
+    """
+    Two readers and three books: the first reader borrows all three (two of them
+    in bulk) and returns one, the second borrows and returns the first book.
+    """
+    auth_header = make_auth_header()
+    readers = [
+        client.post(
+            "/readers/",
+            json={"name": name, "email": f"r_{uuid.uuid4().hex}@example.com", "phone": "9513219876"},
+            headers=auth_header
+        ).json()
+        for name in ("Busy", "Casual")
+    ]
+    books = [
+        client.post("/books/", json={"title": f"Book {i}", "author": "Author", "copies": 2}, headers=auth_header).json()
+        for i in range(3)
+    ]
+    busy, casual = readers[0]["id"], readers[1]["id"]
+    client.post("/loans/", json={"book_id": books[0]["id"], "reader_id": busy}, headers=auth_header)
+    client.post(
+        "/loans/bulk", json={"reader_id": busy, "book_ids": [books[1]["id"], books[2]["id"]]}, headers=auth_header
+    )
+    client.post("/loans/return", json={"book_id": books[2]["id"], "reader_id": busy}, headers=auth_header)
+    client.post("/loans/", json={"book_id": books[0]["id"], "reader_id": casual}, headers=auth_header)
+    client.post(
+        "/loans/return/bulk", json={"reader_id": casual, "book_ids": [books[0]["id"]]}, headers=auth_header
+    )
+    return auth_header, books, readers
+
+
+def test_rollups_follow_checkouts_and_returns(circulation):
+    _, books, readers = circulation
+    today = datetime.now(timezone.utc).date()
+    book_rows, reader_rows = _rollups()
+    assert book_rows == [
+        (today, books[0]["id"], 2, 1),
+        (today, books[1]["id"], 1, 0),
+        (today, books[2]["id"], 1, 1),
+    ]
+    assert reader_rows == [
+        (today, readers[0]["id"], 3, 1),
+        (today, readers[1]["id"], 1, 1),
+    ]
+
+
+def test_return_is_counted_on_its_return_date(client, circulation):
+    auth_header, books, readers = circulation
+    now = datetime.now(timezone.utc)
+    loan = client.get(f"/loans/{readers[0]['id']}", headers=auth_header).json()[0]
+    _set_loan_date(loan["id"], now - timedelta(days=3))
+    resp = client.post(
+        "/loans/return",
+        json={
+            "book_id": loan["book_id"], "reader_id": readers[0]["id"],
+            "return_date": (now - timedelta(days=1)).isoformat()
+        },
+        headers=auth_header
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    _, reader_rows = _rollups()
+    assert (now.date() - timedelta(days=1), readers[0]["id"], 0, 1) in reader_rows
+
+
+def test_backfill_matches_incremental_rollups(circulation):
+    before = _rollups()
+    assert _backfill() == (len(before[0]), len(before[1]))
+    assert _rollups() == before
+
+
+def test_backfill_takes_utc_day_on_postgresql():
+    from sqlalchemy.dialects import postgresql
+
+    day = StatsService.utc_day("postgresql", Loan.loan_date)
+    compiled = day.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    assert str(compiled) == "date(timezone('UTC', loans.loan_date))"
+
+
+def test_top_books_and_readers(client, circulation):
+    auth_header, books, readers = circulation
+    resp = client.get("/stats/books/top", params={"limit": 2}, headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    top = resp.json()
+    assert [item["book_id"] for item in top] == [books[0]["id"], books[1]["id"]]
+    assert top[0] == {"book_id": books[0]["id"], "title": "Book 0", "author": "Author", "checkouts": 2}
+
+    top = client.get("/stats/readers/top", headers=auth_header).json()
+    assert [(item["reader_id"], item["checkouts"]) for item in top] == [
+        (readers[0]["id"], 3), (readers[1]["id"], 1)
+    ]
+    assert top[0]["name"] == "Busy"
+
+
+def test_daily_circulation(client, circulation):
+    auth_header, _, _ = circulation
+    today = datetime.now(timezone.utc).date()
+    resp = client.get("/stats/daily", headers=auth_header)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == [{"day": str(today), "checkouts": 4, "returns": 2}]
+
+    resp = client.get("/stats/daily", params={"date_to": str(today - timedelta(days=1))}, headers=auth_header)
+    assert resp.json() == []
+
+    resp = client.get(
+        "/stats/daily", params={"date_from": str(today), "date_to": str(today - timedelta(days=1))},
+        headers=auth_header
+    )
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_daily_circulation_outlives_deleted_books_and_readers(client, circulation):
+    auth_header, books, readers = circulation
+    before = client.get("/stats/daily", headers=auth_header).json()
+    assert client.delete(f"/books/{books[2]['id']}", headers=auth_header).status_code == status.HTTP_204_NO_CONTENT
+    assert client.delete(f"/readers/{readers[1]['id']}", headers=auth_header).status_code == status.HTTP_204_NO_CONTENT
+    assert client.get("/stats/daily", headers=auth_header).json() == before
+
+
+def test_stats_require_auth(client):
+    assert client.get("/stats/books/top").status_code == status.HTTP_401_UNAUTHORIZED